@@ -0,0 +1,154 @@
+import functools
+
+from django.core.paginator import InvalidPage, Paginator
+from django.http import Http404, HttpResponse, HttpResponseNotAllowed
+from rest_framework import exceptions
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from authentication.backends import JWTAuthentication
+from authors.models import Author
+from books.models import Book
+from config.async_db import db_sync_to_async
+from config.conditional import conditional_content_response, conditional_object
+from config.pagination import paginate_keyset
+
+from .renderers import dumps
+from .views import (AuthorDetailAPIView, AuthorsListAPIView, BookDetailAPIView, BooksListAPIView,
+                    sparse_fields_variant)
+
+jwt_authentication = JWTAuthentication()
+
+
+def _response(envelope, data, status=200):
+    return HttpResponse(dumps({envelope: data}), content_type='application/json', status=status)
+
+
+def async_api_view(envelope):
+    """
+    Async GET-only view with JWT authentication. The view returns data which is rendered like by the sync api:
+    {envelope: data}, or a ready response (304); errors have the same bodies and status codes as there.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return HttpResponseNotAllowed(['GET'])
+            try:
+                auth = await jwt_authentication.authenticate_async(request)
+                if auth is None:
+                    raise exceptions.NotAuthenticated()
+                request.user, request.auth = auth
+                data = await view(request, *args, **kwargs)
+            except (exceptions.NotAuthenticated, exceptions.AuthenticationFailed) as error:
+                # JWTAuthentication has no WWW-Authenticate header, so DRF answers 403 too.
+                return _response(envelope, {'detail': error.detail}, status=403)
+            except exceptions.ValidationError as error:
+                # Wrapped like by config.exceptions.core_exception_handler
+                return _response(envelope, {'errors': error.detail}, status=error.status_code)
+            except exceptions.APIException as error:
+                return _response(envelope, {'detail': error.detail}, status=error.status_code)
+            except Http404:
+                return _response(envelope, {'detail': 'Not found.'}, status=404)
+            if isinstance(data, HttpResponse):
+                return data
+            return _response(envelope, data)
+        return wrapper
+    return decorator
+
+
+def _api_view(view_class, request, **kwargs):
+    """
+    The sync api view set up for an already authenticated request, so its get_queryset(), get_serializer()
+    and get_keyset_ordering() (search, sparse fields, visibility) are not repeated here.
+    """
+    view = view_class()
+    view.setup(request, **kwargs)
+    view.request = view.initialize_request(request, **kwargs)
+    view.request.user, view.request.auth = request.user, request.auth
+    view.format_kwarg = None
+    return view
+
+
+def _paginate(request, view):
+    """ The same pages as KeysetCursorPagination: cursor pages by keyset ordering, page numbers if it is None. """
+    queryset, ordering = view.get_queryset(), view.get_keyset_ordering()
+    url = request.build_absolute_uri()
+    if ordering is None:
+        paginator = Paginator(queryset, api_settings.PAGE_SIZE)
+        try:
+            page = paginator.page(request.GET.get('page', 1))
+        except InvalidPage:
+            raise exceptions.NotFound('Invalid page.')
+        return {
+            'count': paginator.count,
+            'next': replace_query_param(url, 'page', page.next_page_number()) if page.has_next() else None,
+            'previous': (None if not page.has_previous() else
+                         remove_query_param(url, 'page') if page.previous_page_number() == 1 else
+                         replace_query_param(url, 'page', page.previous_page_number())),
+            'results': view.get_serializer(page.object_list, many=True).data,
+        }
+
+    try:
+        page = paginate_keyset(queryset, ordering, request.GET.get('cursor'), api_settings.PAGE_SIZE)
+    except ValueError:
+        raise exceptions.NotFound('Invalid cursor.')
+    return {
+        'next': replace_query_param(url, 'cursor', page.next_cursor) if page.next_cursor else None,
+        'previous': replace_query_param(url, 'cursor', page.previous_cursor) if page.previous_cursor else None,
+        'results': view.get_serializer(page.object_list, many=True).data,
+    }
+
+
+def _detail(view_class, model, envelope, request, pk):
+    """ Serialized object of the view, or 304 for a matching If-None-Match / If-Modified-Since. """
+    view = _api_view(view_class, request, pk=pk)
+
+    @conditional_object(model, variant=sparse_fields_variant)
+    def get(request, pk):
+        return _response(envelope, view.get_serializer(view.get_object()).data)
+    return get(request, pk=pk)
+
+
+@db_sync_to_async
+def _books_page(request):
+    page = _paginate(request, _api_view(BooksListAPIView, request))
+    return conditional_content_response(request, _response('books', page))
+
+
+@db_sync_to_async
+def _book(request, pk):
+    return _detail(BookDetailAPIView, Book, 'books', request, pk)
+
+
+@db_sync_to_async
+def _authors_page(request):
+    page = _paginate(request, _api_view(AuthorsListAPIView, request))
+    return conditional_content_response(request, _response('authors', page))
+
+
+@db_sync_to_async
+def _author(request, pk):
+    return _detail(AuthorDetailAPIView, Author, 'authors', request, pk)
+
+
+@async_api_view('books')
+async def books_list(request):
+    """ Async version of BooksListAPIView: '?search=', '?fields=', '?expand=', '?cursor=' and '?page='. """
+    return await _books_page(request)
+
+
+@async_api_view('books')
+async def book_detail(request, pk):
+    return await _book(request, pk)
+
+
+@async_api_view('authors')
+async def authors_list(request):
+    """ Async version of AuthorsListAPIView. """
+    return await _authors_page(request)
+
+
+@async_api_view('authors')
+async def author_detail(request, pk):
+    return await _author(request, pk)
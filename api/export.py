@@ -0,0 +1,151 @@
+import csv
+import io
+import zlib
+
+from django.utils.dateparse import parse_datetime
+
+from authors.models import Author
+from books.models import Book, BookReview
+
+from .renderers import STREAM_CHUNK_SIZE, dumps, iter_chunks
+
+
+def book_row(book):
+    return {
+        'id': book.id,
+        'isbn13': book.isbn13,
+        'title': book.title,
+        'description': book.description,
+        'popularity_rank': book.popularity_rank,
+        'reviews_count': book.reviews_count,
+        'updated_at': book.updated_at,
+        'authors': [{'id': author.id, 'first_name': author.first_name, 'last_name': author.last_name}
+                    for author in book.authors.all()],
+    }
+
+
+def book_csv_row(book):
+    row = book_row(book)
+    authors = row.pop('authors')
+    row['author_ids'] = ';'.join(str(author['id']) for author in authors)
+    row['authors'] = ';'.join(f'{author["first_name"]} {author["last_name"]}' for author in authors)
+    return row
+
+
+def author_row(author):
+    return {
+        'id': author.id,
+        'first_name': author.first_name,
+        'last_name': author.last_name,
+        'description': author.description,
+        'books_count': author.books_count,
+        'updated_at': author.updated_at,
+    }
+
+
+def review_row(review):
+    return {
+        'id': review.id,
+        'book_id': review.book_id,
+        'user_id': review.user_id,
+        'username': review.user.username,
+        'body': review.body,
+        'date_added': review.date_added,
+        'updated_at': review.updated_at,
+        'comments_count': review.comments_count,
+    }
+
+
+class Exporter:
+    """ What to export for a resource: queryset, row builders and the field used by 'since' filter. """
+
+    def __init__(self, queryset, row, csv_row=None, prefetch=(), since_field=None):
+        self.queryset = queryset
+        self.row = row
+        self.csv_row = csv_row or row
+        self.prefetch = prefetch
+        self.since_field = since_field
+
+    def get_queryset(self, since=None):
+        queryset = self.queryset().order_by('id')
+        if since is not None:
+            if self.since_field is None:
+                raise ValueError('"since" filter is not supported for this resource.')
+            queryset = queryset.filter(**{f'{self.since_field}__gte': since})
+        return queryset
+
+
+EXPORTERS = {
+    'books': Exporter(Book.objects.visible, book_row, book_csv_row, prefetch=('authors',), since_field='updated_at'),
+    'authors': Exporter(Author.objects.all, author_row, since_field='updated_at'),
+    'reviews': Exporter(lambda: BookReview.objects.select_related('user'), review_row, since_field='updated_at'),
+}
+
+
+def parse_since(value):
+    """ ISO 8601 date or datetime -> datetime, ValueError for garbage. """
+    if not value:
+        return None
+    since = parse_datetime(value) or parse_datetime(f'{value}T00:00:00+00:00')
+    if since is None:
+        raise ValueError('"since" should be an ISO 8601 date or datetime.')
+    return since
+
+
+def export(resource, output='ndjson', since=None, chunk_size=STREAM_CHUNK_SIZE):
+    """ Yield bytes of the whole resource in NDJSON or CSV. """
+    exporter = EXPORTERS[resource]
+    queryset = exporter.get_queryset(since)
+    chunks = iter_chunks(queryset, chunk_size, exporter.prefetch)
+    if output == 'csv':
+        yield from _csv_lines(chunks, exporter.csv_row)
+    else:
+        for chunk in chunks:
+            yield b''.join(dumps(exporter.row(obj)) + b'\n' for obj in chunk)
+
+
+def _csv_lines(chunks, make_row):
+    buffer = io.StringIO()
+    writer = None
+    for chunk in chunks:
+        for obj in chunk:
+            row = make_row(obj)
+            if writer is None:
+                writer = csv.DictWriter(buffer, fieldnames=list(row))
+                writer.writeheader()
+            writer.writerow(row)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def accepts_gzip(accept_encoding):
+    """
+    True if an Accept-Encoding header value allows gzip: 'gzip' or '*' with a non-zero q.
+    'gzip;q=0' refuses it, and so does '*;q=0' unless gzip is listed itself.
+    """
+    qualities = {}
+    for coding in accept_encoding.split(','):
+        name, *params = [part.strip() for part in coding.split(';')]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name:
+            qualities[name.lower()] = quality
+    quality = qualities.get('gzip', qualities.get('x-gzip', qualities.get('*', 0.0)))
+    return quality > 0
+
+
+def gzip_stream(chunks, level=6):
+    """ Compress a bytes stream on the fly. """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,107 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client
+
+from config.metrics import percentile
+from users.models import User
+
+# Not an INTERNAL_IPS address, so the debug toolbar does not take part in the numbers.
+CLIENT_ADDRESS = '10.0.0.1'
+
+
+class ThreadSampler:
+    """ Peak number of threads of the process while the benchmark runs. """
+
+    def __init__(self):
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(0.005):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+class Command(BaseCommand):
+    help = ('Compare throughput and latency of the sync api under WSGI, the sync api under ASGI '
+            'and the async api (/api/async/...) under ASGI at the same concurrency.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=20, help='Threads for WSGI, tasks for ASGI.')
+        parser.add_argument('--path', default='books/', help='Api path, e.g. "books/", "authors/" or "books/1".')
+        parser.add_argument('--username', help='User for the JWT token (default: any active user).')
+
+    def get_token(self, username):
+        users = User.objects.filter(is_active=True)
+        user = users.filter(username=username).first() if username else users.order_by('id').first()
+        if user is None:
+            raise CommandError('No user for the token, run seed_data or pass --username.')
+        return user.token
+
+    def run_wsgi(self, url, token, requests, concurrency):
+        """ A threaded WSGI server: every request holds a thread until it is done. """
+        local = threading.local()
+
+        def call(_):
+            if not hasattr(local, 'client'):
+                local.client = Client(REMOTE_ADDR=CLIENT_ADDRESS)
+            started = time.perf_counter()
+            response = local.client.get(url, HTTP_AUTHORIZATION=f'Token {token}')
+            return time.perf_counter() - started, response.status_code
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return list(executor.map(call, range(requests)))
+
+    def run_asgi(self, url, token, requests, concurrency):
+        """ An ASGI server: one event loop, at most concurrency requests in flight. """
+        async def main():
+            client = AsyncClient(client=[CLIENT_ADDRESS, 0])
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def call():
+                async with semaphore:
+                    started = time.perf_counter()
+                    response = await client.get(url, authorization=f'Token {token}')
+                    return time.perf_counter() - started, response.status_code
+
+            return await asyncio.gather(*(call() for _ in range(requests)))
+
+        return asyncio.run(main())
+
+    def handle(self, *args, **options):
+        token = self.get_token(options['username'])
+        path = options['path'].lstrip('/')
+        runs = [
+            ('WSGI, sync views', self.run_wsgi, f'/api/{path}'),
+            ('ASGI, sync views', self.run_asgi, f'/api/{path}'),
+        ]
+        if settings.API_ASYNC_VIEWS:
+            runs.append(('ASGI, async views', self.run_asgi, f'/api/async/{path}'))
+        else:
+            self.stdout.write('Async views are off, set API_ASYNC_VIEWS=true to compare them too.')
+        self.stdout.write(f'{options["requests"]} requests to {path}, concurrency {options["concurrency"]}')
+        self.stdout.write(f'{"":<20}{"req/s":>10}{"p50 ms":>10}{"p99 ms":>10}{"threads":>10}{"errors":>8}')
+        for name, run, url in runs:
+            run(url, token, options['concurrency'], options['concurrency'])  # warm up connections and caches
+            with ThreadSampler() as sampler:
+                started = time.perf_counter()
+                results = run(url, token, options['requests'], options['concurrency'])
+                elapsed = time.perf_counter() - started
+            timings = [duration * 1000 for duration, status in results]
+            errors = sum(status != 200 for duration, status in results)
+            self.stdout.write(f'{name:<20}{len(results) / elapsed:>10.0f}{percentile(timings, 0.5):>10.1f}'
+                              f'{percentile(timings, 0.99):>10.1f}{sampler.peak:>10}{errors:>8}')
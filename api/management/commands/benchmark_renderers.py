@@ -0,0 +1,47 @@
+import json
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from api.renderers import BooksJSONRenderer
+
+
+def legacy_render(data):
+    """ What the previous str based renderers did: json.dumps to str, then DRF encodes it to bytes. """
+    return json.dumps({'books': data}).encode('utf-8')
+
+
+class Command(BaseCommand):
+    help = 'Compare the orjson based API renderers with the previous json.dumps renderers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Books in the payload.')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def get_payload(self, rows):
+        return {
+            'next': 'http://localhost/api/books/?cursor=eyJwIjpbMyw3XSwiciI6ZmFsc2V9',
+            'previous': None,
+            'results': [{
+                'id': i,
+                'isbn13': f'{9780000000000 + i}',
+                'title': f'Book title number {i} – Ünïcode',
+                'authors': [i, i + 1, i + 2],
+                'description': 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 5,
+                'reviews_count': i % 50,
+            } for i in range(rows)]
+        }
+
+    def handle(self, *args, **options):
+        payload = self.get_payload(options['rows'])
+        renderer = BooksJSONRenderer()
+        assert json.loads(renderer.render(payload)) == json.loads(legacy_render(payload))
+
+        results = {}
+        for name, func in (('json.dumps (legacy)', legacy_render), ('orjson (current)', renderer.render)):
+            best = min(timeit.repeat(lambda: func(payload), number=1, repeat=options['repeat']))
+            results[name] = best
+            self.stdout.write(f'{name:<22} {best * 1000:9.2f} ms  {len(func(payload)) / 1024:9.1f} KiB')
+
+        legacy, current = results.values()
+        self.stdout.write(self.style.SUCCESS(f'Speedup: {legacy / current:.1f}x'))
@@ -0,0 +1,36 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.export import EXPORTERS, export, gzip_stream, parse_since
+from api.renderers import STREAM_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Stream books (with authors), authors or reviews to NDJSON or CSV with constant memory.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('resource', choices=list(EXPORTERS))
+        parser.add_argument('--output', choices=['ndjson', 'csv'], default='ndjson')
+        parser.add_argument('--since', help='ISO 8601 date or datetime: only objects changed after it.')
+        parser.add_argument('--file', help='Write to the file instead of stdout.')
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--chunk-size', type=int, default=STREAM_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            since = parse_since(options['since'])
+            EXPORTERS[options['resource']].get_queryset(since)
+        except ValueError as error:
+            raise CommandError(error)
+
+        stream = export(options['resource'], options['output'], since, options['chunk_size'])
+        if options['gzip']:
+            stream = gzip_stream(stream)
+        file = open(options['file'], 'wb') if options['file'] else sys.stdout.buffer
+        try:
+            for chunk in stream:
+                file.write(chunk)
+        finally:
+            if options['file']:
+                file.close()
@@ -1,17 +1,81 @@
-import json
+import decimal
 
+import orjson
+from django.db.models import prefetch_related_objects
+from django.utils.functional import Promise
 from rest_framework.renderers import JSONRenderer
 
+STREAM_CHUNK_SIZE = 2000
 
-class BooksJSONRenderer(JSONRenderer):
-    charset = 'utf-8'
 
-    def render(self, data, accepted_media_type=None, renderer_context=None):
-        return json.dumps({'books': data})
+def _default(obj):
+    """ Types orjson does not know about. """
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if isinstance(obj, Promise):
+        return str(obj)
+    if hasattr(obj, '__iter__'):
+        return list(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
 
+def dumps(data):
+    return orjson.dumps(data, default=_default)
 
-class AuthorsJSONRenderer(JSONRenderer):
-    charset = 'utf-8'
+
+class EnvelopeJSONRenderer(JSONRenderer):
+    """
+    Render data straight to bytes with orjson as {envelope: data}.
+    Pagination metadata (next, previous, results) is kept inside the envelope.
+    """
+    charset = None
+    envelope = None
 
     def render(self, data, accepted_media_type=None, renderer_context=None):
-        return json.dumps({'authors': data})
+        if data is None:
+            return b''
+        return dumps({self.envelope: data})
+
+
+class BooksJSONRenderer(EnvelopeJSONRenderer):
+    envelope = 'books'
+
+
+class AuthorsJSONRenderer(EnvelopeJSONRenderer):
+    envelope = 'authors'
+
+
+class ReviewsJSONRenderer(EnvelopeJSONRenderer):
+    envelope = 'reviews'
+
+
+class CommentsJSONRenderer(EnvelopeJSONRenderer):
+    envelope = 'comments'
+
+
+def iter_chunks(queryset, chunk_size=STREAM_CHUNK_SIZE, prefetch=()):
+    """
+    Yield lists of objects read with a server-side cursor. QuerySet.iterator() ignores prefetch_related,
+    so related objects are prefetched per chunk and memory does not depend on the queryset size.
+    """
+    chunk = []
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(obj)
+        if len(chunk) == chunk_size:
+            if prefetch:
+                prefetch_related_objects(chunk, *prefetch)
+            yield chunk
+            chunk = []
+    if chunk:
+        if prefetch:
+            prefetch_related_objects(chunk, *prefetch)
+        yield chunk
+
+
+def stream_envelope(envelope, queryset, serializer_class, prefetch=(), context=None, chunk_size=STREAM_CHUNK_SIZE):
+    """ Yield '{envelope: [...]}' json in chunks (see iter_chunks). """
+    yield b'{"' + envelope.encode('utf-8') + b'":['
+    for index, chunk in enumerate(iter_chunks(queryset, chunk_size, prefetch)):
+        items = b','.join(dumps(item) for item in serializer_class(chunk, many=True, context=context).data)
+        yield items if index == 0 else b',' + items
+    yield b']}'
@@ -1,27 +1,64 @@
 from rest_framework import serializers
 
-from books.models import Book
+from books.models import Book, BookReview, ReviewComment
 from authors.models import Author
 
 
-class BooksListSerializer(serializers.ModelSerializer):
+class SparseFieldsSerializerMixin:
+    """
+    Serializer with fields trimmed by context['fields'] and relations from context['expand']
+    replaced by nested serializers (see expandable). Fields are changed once, not per object.
+    """
+    expandable = {}  # field name -> serializer class of the related objects
+
+    def __init__(self, *args, **kwargs):
+        super(SparseFieldsSerializerMixin, self).__init__(*args, **kwargs)
+        for name in self.context.get('expand', ()):
+            if name in self.fields:
+                self.fields[name] = self.expandable[name](many=True, read_only=True)
+        fields = self.context.get('fields')
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class AuthorSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Author
+        fields = ['id', 'first_name', 'last_name', 'books_count']
+
+
+class BooksListSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
+    expandable = {'authors': AuthorSerializer}
 
     class Meta:
         model = Book
-        fields = ['id', 'isbn13', 'title', 'authors']
+        fields = ['id', 'isbn13', 'title', 'authors', 'authors_display', 'reviews_count']
 
 
-class BookSerializer(serializers.ModelSerializer):
+class BookSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
+    expandable = {'authors': AuthorSerializer}
     # title = serializers.CharField(allow_blank=True)
 
     class Meta:
         model = Book
-        fields = ['id', 'isbn13', 'title', 'authors', 'description']
+        fields = ['id', 'isbn13', 'title', 'authors', 'authors_display', 'description', 'reviews_count']
         # fields = ['id']
 
 
-class AuthorSerializer(serializers.ModelSerializer):
+class ReviewSerializer(serializers.ModelSerializer):
+    username = serializers.CharField(source='user.username', read_only=True)
 
     class Meta:
-        model = Author
-        fields = ['id', 'first_name', 'last_name']
+        model = BookReview
+        fields = ['id', 'book', 'user', 'username', 'body', 'date_added', 'updated_at', 'comments_count']
+
+
+class CommentSerializer(serializers.ModelSerializer):
+    username = serializers.CharField(source='user.username', read_only=True)
+    depth = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = ReviewComment
+        fields = ['id', 'review', 'parent', 'depth', 'user', 'username', 'body', 'date_added', 'updated_at']
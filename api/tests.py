@@ -1,3 +1,146 @@
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
 
-# Create your tests here.
+from api.export import accepts_gzip
+from api.views import BIGINT_MAX
+from books.models import Book
+from users.models import User
+
+
+class APITestCase(TestCase):
+    """ Requests with a JWT token of a fresh user. """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', email='reader@example.com', password='password')
+
+    def setUp(self):
+        self.client.defaults['REMOTE_ADDR'] = '10.0.0.1'
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Token {self.user.token}'
+
+
+class ConditionalDetailTest(APITestCase):
+    """ ETag of an api detail page covers the representation selected by '?fields=' and '?expand='. """
+
+    @classmethod
+    def setUpTestData(cls):
+        super(ConditionalDetailTest, cls).setUpTestData()
+        cls.book = Book.objects.create(title='Galaxy travels')
+
+    def get(self, query='', **headers):
+        return self.client.get(reverse('api:detail-book', kwargs={'pk': self.book.id}) + query, **headers)
+
+    def test_same_fields_not_modified(self):
+        etag = self.get('?fields=title,id')['ETag']
+        self.assertEqual(self.get('?fields=id,title', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_other_fields_modified(self):
+        etag = self.get('?fields=id')['ETag']
+        self.assertEqual(self.get('?fields=id,title', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self.get('?fields=id&expand=authors', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_last_modified_only_for_full_representation(self):
+        self.assertTrue(self.get().has_header('Last-Modified'))
+        self.assertFalse(self.get('?fields=id').has_header('Last-Modified'))
+
+
+class ConditionalListTest(APITestCase):
+    """ List pages get ETag from their content. """
+
+    @classmethod
+    def setUpTestData(cls):
+        super(ConditionalListTest, cls).setUpTestData()
+        Book.objects.create(title='Galaxy travels')
+
+    def test_not_modified_until_changed(self):
+        url = reverse('api:list-books')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Book.objects.create(title='Stars')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_streamed_list_has_no_etag(self):
+        self.assertFalse(self.client.get(reverse('api:list-books'), {'stream': 'true'}).has_header('ETag'))
+
+
+@override_settings(API_BATCH_LIMIT=3)
+class BatchLookupTest(APITestCase):
+    """ Batch lookups by ids or isbn13: limits, integer normalization and the bigint range. """
+
+    @classmethod
+    def setUpTestData(cls):
+        super(BatchLookupTest, cls).setUpTestData()
+        cls.books = [Book.objects.create(title=f'Book {number}', isbn13=f'978000000000{number}') for number in range(3)]
+
+    def batch(self, **params):
+        return self.client.get(reverse('api:batch-books'), params)
+
+    def test_found_and_not_found(self):
+        data = self.batch(ids=f'{self.books[0].id},0').json()['books']
+        self.assertEqual(data['results'][str(self.books[0].id)]['title'], 'Book 0')
+        self.assertEqual(data['not_found'], ['0'])
+
+    def test_post(self):
+        response = self.client.post(reverse('api:batch-books'), {'isbn13': ['9780000000001']},
+                                    content_type='application/json')
+        self.assertEqual(response.json()['books']['results']['9780000000001']['title'], 'Book 1')
+
+    def test_normalized_keys(self):
+        data = self.batch(ids=f'00{self.books[0].id},{self.books[0].id}').json()['books']
+        self.assertEqual(list(data['results']), [str(self.books[0].id)])
+
+    def test_limit(self):
+        self.assertEqual(self.batch(ids='1,2,3').status_code, 200)
+        self.assertEqual(self.batch(ids='1,2,3,4').status_code, 400)
+        # Duplicates are counted once.
+        self.assertEqual(self.batch(ids='1,2,3,3,03').status_code, 200)
+
+    def test_bigint_range(self):
+        self.assertEqual(self.batch(ids=str(BIGINT_MAX)).status_code, 200)
+        for ids in (str(BIGINT_MAX + 1), '9' * 40, f'000{BIGINT_MAX + 1}'):
+            with self.subTest(ids=ids):
+                self.assertEqual(self.batch(ids=ids).status_code, 400)
+
+    def test_not_integers(self):
+        for ids in ('1,a', '-1', '1.5', '١'):
+            with self.subTest(ids=ids):
+                self.assertEqual(self.batch(ids=ids).status_code, 400)
+
+    def test_one_lookup(self):
+        self.assertEqual(self.batch().status_code, 400)
+        self.assertEqual(self.batch(ids='1', isbn13='9780000000001').status_code, 400)
+
+
+class AsyncViewsTest(APITestCase):
+    """ The async endpoints are opt-in (API_ASYNC_VIEWS), they were slower than the sync ones. """
+
+    def test_off_by_default(self):
+        self.assertEqual(self.client.get('/api/async/books/').status_code, 404)
+
+
+class AcceptsGzipTest(SimpleTestCase):
+
+    def test_accepts(self):
+        for header in ('gzip', 'deflate, gzip;q=0.5', 'GZIP', '*', 'br;q=1, *;q=0.1', 'x-gzip', 'gzip; q=1.0'):
+            with self.subTest(header=header):
+                self.assertTrue(accepts_gzip(header))
+
+    def test_refuses(self):
+        for header in ('', 'identity', 'gzip;q=0', 'gzip; q=0.000', '*;q=0', 'gzip;q=0, *', 'br', 'gzipx',
+                       'gzip;q=bad'):
+            with self.subTest(header=header):
+                self.assertFalse(accepts_gzip(header))
+
+
+class CatalogExportEncodingTest(APITestCase):
+
+    def test_gzip_refused(self):
+        response = self.client.get(reverse('api:catalog-export', kwargs={'resource': 'books'}),
+                                   HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_gzip(self):
+        response = self.client.get(reverse('api:catalog-export', kwargs={'resource': 'books'}),
+                                   HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
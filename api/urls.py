@@ -1,10 +1,24 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
 
 
 urlpatterns = [
     path('books/', views.BooksListAPIView.as_view(), name='list-books'),
     path('books/<int:pk>', views.BookDetailAPIView.as_view(), name='detail-book'),
+    path('books/batch', views.BooksBatchAPIView.as_view(), name='batch-books'),
+    path('books/<int:pk>/reviews', views.BookReviewsAPIView.as_view(), name='book-reviews'),
+    path('reviews/<int:pk>/comments', views.ReviewCommentsAPIView.as_view(), name='review-comments'),
     path('authors/', views.AuthorsListAPIView.as_view()),
-    path('authors/<int:pk>', views.AuthorDetailAPIView.as_view())
+    path('authors/<int:pk>', views.AuthorDetailAPIView.as_view()),
+    path('authors/batch', views.AuthorsBatchAPIView.as_view(), name='batch-authors'),
+    path('export/<str:resource>', views.CatalogExportAPIView.as_view(), name='catalog-export'),
 ]
+
+if settings.API_ASYNC_VIEWS:
+    urlpatterns += [
+        path('async/books/', async_views.books_list, name='async-list-books'),
+        path('async/books/<int:pk>', async_views.book_detail, name='async-detail-book'),
+        path('async/authors/', async_views.authors_list, name='async-list-authors'),
+        path('async/authors/<int:pk>', async_views.author_detail, name='async-detail-author'),
+    ]
@@ -1,36 +1,270 @@
 from django.shortcuts import get_object_or_404
 from django.core.exceptions import MultipleObjectsReturned
+from django.conf import settings
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.decorators import method_decorator
 
 from rest_framework import generics, serializers, status
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 
-from books.models import Book
+from books.models import Book, BookReview, ReviewComment
+from config.conditional import conditional_content, conditional_detail
 from books.models import Author
-from .serializers import BooksListSerializer, AuthorSerializer, BookSerializer
-from .renderers import BooksJSONRenderer, AuthorsJSONRenderer
+from books.search import search_books
+from books.threads import COMMENTS_ORDERING, REVIEWS_ORDERING
+from authors.search import search_authors
+from .serializers import BooksListSerializer, AuthorSerializer, BookSerializer, CommentSerializer, ReviewSerializer
+from .renderers import (BooksJSONRenderer, AuthorsJSONRenderer, CommentsJSONRenderer, ReviewsJSONRenderer,
+                        stream_envelope)
+from .export import EXPORTERS, accepts_gzip, export, gzip_stream, parse_since
+
+BIGINT_MAX = 2 ** 63 - 1  # ids of the batch lookups
+
+
+class StreamingListMixin:
+    """
+    Unpaginated lists (no paginator or '?stream=true') are streamed in chunks from a server-side cursor
+    instead of being serialized into memory at once.
+    """
+    stream_prefetch = ()
+
+    def get_stream_prefetch(self):
+        return self.stream_prefetch
+
+    def list(self, request, *args, **kwargs):
+        if self.paginator is not None and request.query_params.get('stream') != 'true':
+            return super(StreamingListMixin, self).list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        stream = stream_envelope(self.renderer_classes[0].envelope, queryset, self.get_serializer_class(),
+                                 prefetch=self.get_stream_prefetch(), context=self.get_serializer_context())
+        return StreamingHttpResponse(stream, content_type='application/json')
+
+
+def sparse_fields_variant(request):
+    """ Normalized '?fields=' and '?expand=' for conditional_detail: they select the representation. """
+    params = []
+    for param in ('fields', 'expand'):
+        value = request.GET.get(param)
+        if value is not None:
+            params.append(f'{param}={",".join(sorted({name.strip() for name in value.split(",") if name.strip()}))}')
+    return '&'.join(params)
+
+
+class SparseFieldsViewMixin:
+    """
+    '?fields=id,title' returns only these fields, '?expand=authors' embeds author objects instead of ids.
+    Columns are limited with only() and authors are loaded with one prefetch query, whatever the page size.
+    """
+    keyset_ordering = ()
+    required_columns = ()  # loaded even if not requested
+
+    def _parse_list(self, param, allowed):
+        value = self.request.query_params.get(param)
+        if value is None:
+            return None
+        names = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in names if name not in allowed]
+        if unknown:
+            raise ValidationError({param: f'Unknown: {", ".join(unknown)}. Choose from: {", ".join(allowed)}.'})
+        return names
+
+    def get_fields(self):
+        if not hasattr(self, '_fields'):
+            self._fields = self._parse_list('fields', self.get_serializer_class().Meta.fields)
+        return self._fields
+
+    def get_expand(self):
+        if not hasattr(self, '_expand'):
+            self._expand = self._parse_list('expand', list(self.get_serializer_class().expandable)) or []
+        return self._expand
+
+    def get_serializer_context(self):
+        context = super(SparseFieldsViewMixin, self).get_serializer_context()
+        context['fields'] = self.get_fields()
+        context['expand'] = self.get_expand()
+        return context
+
+    def get_prefetch(self):
+        """ Prefetch of the requested relations with only the columns their serializers need. """
+        fields = self.get_fields()
+        prefetch = []
+        for name, serializer_class in self.get_serializer_class().expandable.items():
+            if fields is not None and name not in fields:
+                continue
+            columns = serializer_class.Meta.fields if name in self.get_expand() else ['id']
+            related_model = self.get_serializer_class().Meta.model._meta.get_field(name).related_model
+            prefetch.append(Prefetch(name, queryset=related_model.objects.only(*columns)))
+        return prefetch
+
+    def get_stream_prefetch(self):
+        return self.get_prefetch()
+
+    def get_sparse_queryset(self, queryset):
+        fields = self.get_fields()
+        if fields is not None:
+            model = queryset.model
+            columns = {name for name in fields if model._meta.get_field(name).concrete
+                       and not model._meta.get_field(name).many_to_many}
+            # Keyset pagination reads the ordering fields of the last row.
+            columns |= {'id', *self.required_columns, *(field.lstrip('-') for field in self.keyset_ordering)}
+            queryset = queryset.only(*columns)
+        return queryset.prefetch_related(*self.get_prefetch())
+
+
+class BatchLookupMixin:
+    """
+    Resolve many objects at once: '?ids=1,2,3' (or another lookup from batch_lookups), or POST {"ids": [1, 2, 3]}.
+    Runs a single IN query and returns {"results": {input value: object or null}, "not_found": [input values]}.
+    Integer values are reported in their normal form: '007' as '7'.
+    """
+    batch_lookups = {'ids': 'id'}  # parameter -> model field
+    integer_lookups = ('ids',)
+
+    def get_batch(self, request):
+        params = request.data if request.method == 'POST' else request.query_params
+        given = [param for param in self.batch_lookups if param in params]
+        if len(given) != 1:
+            raise ValidationError({'error': f'Pass exactly one of: {", ".join(self.batch_lookups)}.'})
+        param = given[0]
+        values = params[param]
+        if isinstance(values, str):
+            values = values.split(',')
+        if not isinstance(values, list):
+            raise ValidationError({param: 'Expected a list.'})
+        keys = list(dict.fromkeys(str(value).strip() for value in values if str(value).strip()))
+        if param in self.integer_lookups:
+            # isdecimal() alone accepts other scripts' digits, int() reads them but ids are reported in ascii.
+            if not all(key.isascii() and key.isdecimal() for key in keys):
+                raise ValidationError({param: 'Expected integers.'})
+            # '007' finds and is reported as '7', values over bigint would fail in the database.
+            keys = list(dict.fromkeys(key.lstrip('0') or '0' for key in keys))
+            if any(len(key) > len(str(BIGINT_MAX)) or int(key) > BIGINT_MAX for key in keys):
+                raise ValidationError({param: f'Expected integers up to {BIGINT_MAX}.'})
+        if len(keys) > settings.API_BATCH_LIMIT:
+            raise ValidationError({param: f'At most {settings.API_BATCH_LIMIT} values per request.'})
+        return self.batch_lookups[param], keys
+
+    def batch(self, request, *args, **kwargs):
+        field, keys = self.get_batch(request)
+        found = {str(getattr(obj, field)): obj for obj in self.get_queryset().filter(**{f'{field}__in': keys})}
+        objects = [found[key] for key in keys if key in found]
+        data = dict(zip((str(getattr(obj, field)) for obj in objects), self.get_serializer(objects, many=True).data))
+        return Response({
+            'results': {key: data.get(key) for key in keys},
+            'not_found': [key for key in keys if key not in found],
+        })
+
+    def get(self, request, *args, **kwargs):
+        return self.batch(request, *args, **kwargs)
+
+    def post(self, request, *args, **kwargs):
+        return self.batch(request, *args, **kwargs)
 
 
 # Create your views here.
-class BooksListAPIView(generics.ListAPIView):
-    queryset = Book.objects.all()
+@method_decorator(conditional_content, name='dispatch')
+class BooksListAPIView(SparseFieldsViewMixin, StreamingListMixin, generics.ListAPIView):
+    queryset = Book.objects.visible()
     permission_classes = [IsAuthenticated]
     serializer_class = BooksListSerializer
     renderer_classes = [BooksJSONRenderer]
+    keyset_ordering = ('-popularity', 'id')
+
+    def get_keyset_ordering(self):
+        """ Cursor pagination for the catalog, regular pagination for relevance ordered search results. """
+        return None if self.request.query_params.get('search') else self.keyset_ordering
 
+    def get_queryset(self):
+        """ Return all books or ranked full-text search results for '?search=' parameter. """
+        queryset = self.get_sparse_queryset(super(BooksListAPIView, self).get_queryset())
+        query = self.request.query_params.get('search')
+        if query:
+            return search_books(queryset, query)
+        return queryset.order_by('-popularity', 'id')
 
-class BookDetailAPIView(generics.RetrieveAPIView):
-    queryset = Book.objects.all()
+
+class BookDetailAPIView(SparseFieldsViewMixin, generics.RetrieveAPIView):
+    queryset = Book.objects.visible()
     permission_classes = [IsAuthenticated]
     serializer_class = BookSerializer
     renderer_classes = [BooksJSONRenderer]
 
+    def get_queryset(self):
+        return self.get_sparse_queryset(super(BookDetailAPIView, self).get_queryset())
+
+    @conditional_detail(Book, variant=sparse_fields_variant)
+    def get(self, request, *args, **kwargs):
+        return super(BookDetailAPIView, self).get(request, *args, **kwargs)
+
+
+class BooksBatchAPIView(BatchLookupMixin, SparseFieldsViewMixin, generics.GenericAPIView):
+    queryset = Book.objects.visible()
+    permission_classes = [IsAuthenticated]
+    serializer_class = BooksListSerializer
+    renderer_classes = [BooksJSONRenderer]
+    batch_lookups = {'ids': 'id', 'isbn13': 'isbn13'}
+    required_columns = ('isbn13',)  # results are keyed by it
+
+    def get_queryset(self):
+        return self.get_sparse_queryset(super(BooksBatchAPIView, self).get_queryset())
+
+
+class BookReviewsAPIView(generics.ListAPIView):
+    """ Reviews of a book, oldest first, by cursor pages. Comments are listed by ReviewCommentsAPIView. """
+    permission_classes = [IsAuthenticated]
+    serializer_class = ReviewSerializer
+    renderer_classes = [ReviewsJSONRenderer]
+    keyset_ordering = REVIEWS_ORDERING
+
+    def get_keyset_ordering(self):
+        return self.keyset_ordering
+
+    def get_queryset(self):
+        if not Book.objects.visible().filter(pk=self.kwargs['pk']).exists():
+            raise NotFound()
+        return BookReview.objects.filter(book=self.kwargs['pk']).select_related('user')
+
+
+class ReviewCommentsAPIView(generics.ListAPIView):
+    """ Comments of a review in thread order (every comment is followed by its replies), by cursor pages. """
+    permission_classes = [IsAuthenticated]
+    serializer_class = CommentSerializer
+    renderer_classes = [CommentsJSONRenderer]
+    keyset_ordering = COMMENTS_ORDERING
+
+    def get_keyset_ordering(self):
+        return self.keyset_ordering
+
+    def get_queryset(self):
+        if not BookReview.objects.filter(pk=self.kwargs['pk']).exists():
+            raise NotFound()
+        return ReviewComment.objects.filter(review=self.kwargs['pk']).thread().select_related('user')
 
-class AuthorsListAPIView(generics.ListAPIView):
+
+@method_decorator(conditional_content, name='dispatch')
+class AuthorsListAPIView(StreamingListMixin, generics.ListAPIView):
     queryset = Author.objects.all()
     permission_classes = [IsAuthenticated]
     serializer_class = AuthorSerializer
     renderer_classes = [AuthorsJSONRenderer]
+    keyset_ordering = ('last_name', 'id')
+
+    def get_keyset_ordering(self):
+        """ Cursor pagination for all authors, regular pagination for similarity ordered search results. """
+        return None if self.request.query_params.get('search') else self.keyset_ordering
+
+    def get_queryset(self):
+        """ Return all authors or fuzzy search results for '?search=' parameter. """
+        queryset = super(AuthorsListAPIView, self).get_queryset()
+        query = self.request.query_params.get('search')
+        if query:
+            return search_authors(queryset, query)
+        return queryset.order_by('last_name', 'id')
 
 
 class AuthorDetailAPIView(generics.RetrieveAPIView):
@@ -39,6 +273,44 @@ class AuthorDetailAPIView(generics.RetrieveAPIView):
     serializer_class = AuthorSerializer
     renderer_classes = [AuthorsJSONRenderer]
 
+    @conditional_detail(Author, variant=sparse_fields_variant)
+    def get(self, request, *args, **kwargs):
+        return super(AuthorDetailAPIView, self).get(request, *args, **kwargs)
+
 
+class AuthorsBatchAPIView(BatchLookupMixin, generics.GenericAPIView):
+    queryset = Author.objects.all()
+    permission_classes = [IsAuthenticated]
+    serializer_class = AuthorSerializer
+    renderer_classes = [AuthorsJSONRenderer]
+
+
+class CatalogExportAPIView(APIView):
+    """
+    Stream books (with authors), authors or reviews as NDJSON ('?output=ndjson', default) or CSV ('?output=csv').
+    '?since=' exports only objects changed after the date. Gzipped on the fly if the client accepts it.
+    """
+    permission_classes = [IsAuthenticated]
+    content_types = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv; charset=utf-8'}
 
+    def get(self, request, resource):
+        if resource not in EXPORTERS:
+            raise NotFound(f'Unknown resource "{resource}".')
+        output = request.query_params.get('output', 'ndjson')
+        if output not in self.content_types:
+            raise ValidationError({'output': f'Choose one of: {", ".join(self.content_types)}.'})
+        try:
+            since = parse_since(request.query_params.get('since'))
+            EXPORTERS[resource].get_queryset(since)
+        except ValueError as error:
+            raise ValidationError({'since': str(error)})
 
+        stream = export(resource, output, since)
+        response = StreamingHttpResponse(content_type=self.content_types[output])
+        if accepts_gzip(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+            stream = gzip_stream(stream)
+            response['Content-Encoding'] = 'gzip'
+        patch_vary_headers(response, ['Accept-Encoding'])
+        response['Content-Disposition'] = f'attachment; filename="{resource}.{output}"'
+        response.streaming_content = stream
+        return response
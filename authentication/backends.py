@@ -4,8 +4,11 @@ from django.conf import settings
 
 from rest_framework import authentication, exceptions
 
+from config.async_db import db_sync_to_async
 from users.models import User
 
+from .cache import token_cache
+
 
 class JWTAuthentication(authentication.BaseAuthentication):
     authentication_header_prefix = 'Token'
@@ -27,6 +30,36 @@ class JWTAuthentication(authentication.BaseAuthentication):
         """
         request.user = None
 
+        token = self._get_token(request)
+        if token is None:
+            return None
+
+        # К настоящему моменту есть "шанс", что аутентификация пройдет успешно.
+        # Мы делегируем фактическую аутентификацию учетных данных методу ниже.
+        return self._authenticate_credentials(request, token)
+
+    async def authenticate_async(self, request):
+        """
+        То же, что authenticate, для асинхронных представлений. Токен из
+        локального кэша проверяется без ожидания, общий кэш и база
+        вызываются в пуле потоков.
+        """
+        token = self._get_token(request)
+        if token is None:
+            return None
+
+        user = token_cache.get_by_token(token)
+        if user is None:
+            user = await db_sync_to_async(self._load_user)(token)
+
+        if not user.is_active:
+            msg = 'This user has been deactivated.'
+            raise exceptions.AuthenticationFailed(msg)
+
+        return (user, token)
+
+    def _get_token(self, request):
+        """ Вернуть JWT из заголовка Authorization или None. """
         # 'auth_header' должен быть массивом с двумя элементами:
         # 1) именем заголовка аутентификации (Token в нашем случае)
         # 2) сам JWT, по которому мы должны пройти аутентифкацию
@@ -56,29 +89,43 @@ class JWTAuthentication(authentication.BaseAuthentication):
             # Префикс заголовка не тот, который мы ожидали - отказ.
             return None
 
-        # К настоящему моменту есть "шанс", что аутентификация пройдет успешно.
-        # Мы делегируем фактическую аутентификацию учетных данных методу ниже.
-        return self._authenticate_credentials(request, token)
+        return token
 
     def _authenticate_credentials(self, request, token):
         """
         Попытка аутентификации с предоставленными данными. Если успешно -
         вернуть пользователя и токен, иначе - сгенерировать исключение.
+        Проверенные токены и снимки пользователей кэшируются (см. TokenCache),
+        так что запрос к базе выполняется только при промахе кэша.
         """
+        user = token_cache.get_by_token(token)
+        if user is None:
+            user = self._load_user(token)
+
+        if not user.is_active:
+            msg = 'This user has been deactivated.'
+            raise exceptions.AuthenticationFailed(msg)
+
+        return (user, token)
+
+    def _load_user(self, token):
+        """ Декодировать токен и получить пользователя из общего кэша или из базы. """
         try:
             payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
         except Exception as e:
             msg = 'Authentication error. Unable to decode token.'
             raise exceptions.AuthenticationFailed(msg)
 
-        try:
-            user = User.objects.get(pk=payload['id'])
-        except User.DoesNotExist:
-            msg = 'No user matching this token was found.'
-            raise exceptions.AuthenticationFailed(msg)
-
-        if not user.is_active:
-            msg = 'This user has been deactivated.'
-            raise exceptions.AuthenticationFailed(msg)
-
-        return (user, token)
\ No newline at end of file
+        version = token_cache.user_version(payload['id'])
+        user = token_cache.get_by_id(payload['id'], version)
+        if user is None:
+            try:
+                user = User.objects.get(pk=payload['id'])
+            except User.DoesNotExist:
+                msg = 'No user matching this token was found.'
+                raise exceptions.AuthenticationFailed(msg)
+        else:
+            version = None  # already shared
+
+        token_cache.set(token, user, token_expires_at=payload.get('exp'), version=version)
+        return user
\ No newline at end of file
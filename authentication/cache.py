@@ -0,0 +1,136 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from config.cache import bump_version, get_version
+from config.metrics import record_cache
+from users.models import User
+
+
+def _version_key(user_id):
+    return f'auth:user-version:{user_id}'
+
+
+def _user_key(user_id, version):
+    return f'auth:user:{user_id}:{version}'
+
+
+def _token_key(token):
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+# Fields token authentication and permission checks read. The rest (password hash, counters and image_hash
+# updated with .update() without invalidation) is loaded on access, and save() writes only the loaded fields.
+SNAPSHOT_FIELDS = ('id', 'username', 'email', 'first_name', 'last_name', 'is_active', 'is_staff', 'is_superuser')
+
+
+def snapshot_user(user):
+    """ Plain dict of SNAPSHOT_FIELDS values, safe to pickle into a shared cache. """
+    return {name: getattr(user, name) for name in SNAPSHOT_FIELDS}
+
+
+def user_from_snapshot(snapshot):
+    """ Build a User instance from a snapshot without a database query, fields missing in it are deferred. """
+    # from_db() expects the values of a subset of fields in the model field order.
+    names = [field.attname for field in User._meta.concrete_fields if field.attname in snapshot]
+    return User.from_db(DEFAULT_DB_ALIAS, names, [snapshot[name] for name in names])
+
+
+class TokenCache:
+    """
+    Two level cache of verified JWT tokens:
+    1) in-process LRU: token -> user snapshot, bounded by LOCAL_MAXSIZE and LOCAL_TTL (and token 'exp');
+    2) shared django cache: user id and version -> user snapshot, SHARED_TTL. Invalidation bumps the version,
+       so a snapshot loaded before it is stored under the old version and not read again.
+    A token found in the local LRU is not even decoded again.
+    Other processes notice invalidation of a user not later than LOCAL_TTL seconds.
+    """
+
+    def __init__(self, maxsize, local_ttl, shared_ttl):
+        self.maxsize = maxsize
+        self.local_ttl = local_ttl
+        self.shared_ttl = shared_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def get_by_token(self, token):
+        key = _token_key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.time():
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._stats['local_hits'] += 1
+        record_cache('jwt_local', entry is not None)
+        return user_from_snapshot(entry[1]) if entry is not None else None
+
+    def user_version(self, user_id):
+        """ Read it before the user is loaded from the database and pass it to set(). """
+        return get_version(_version_key(user_id))
+
+    def get_by_id(self, user_id, version):
+        snapshot = cache.get(_user_key(user_id, version))
+        record_cache('jwt_shared', snapshot is not None)
+        if snapshot is None:
+            self._count('misses')
+            return None
+        self._count('shared_hits')
+        return user_from_snapshot(snapshot)
+
+    def set(self, token, user, token_expires_at=None, version=None):
+        """
+        Remember a verified token. token_expires_at is the 'exp' claim of the token.
+        A user loaded from the database is shared under its version from user_version().
+        """
+        snapshot = snapshot_user(user)
+        if version is not None:
+            cache.add(_user_key(user.pk, version), snapshot, timeout=self.shared_ttl)
+
+        expires_at = time.time() + self.local_ttl
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        with self._lock:
+            self._entries[_token_key(token)] = (expires_at, snapshot)
+            self._entries.move_to_end(_token_key(token))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def invalidate_user(self, user_id):
+        """ Drop cached snapshots of the user (deactivation, password change, deletion). """
+        bump_version(_version_key(user_id))
+        with self._lock:
+            stale_keys = [key for key, (_, snapshot) in self._entries.items() if snapshot['id'] == user_id]
+            for key in stale_keys:
+                del self._entries[key]
+            self._stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, size=len(self._entries), maxsize=self.maxsize)
+        lookups = stats['local_hits'] + stats['shared_hits'] + stats['misses']
+        stats['hit_ratio'] = round((stats['local_hits'] + stats['shared_hits']) / lookups, 4) if lookups else None
+        return stats
+
+
+token_cache = TokenCache(
+    maxsize=settings.JWT_CACHE['LOCAL_MAXSIZE'],
+    local_ttl=settings.JWT_CACHE['LOCAL_TTL'],
+    shared_ttl=settings.JWT_CACHE['SHARED_TTL'],
+)
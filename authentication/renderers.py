@@ -1,26 +1,13 @@
-import json
+from api.renderers import EnvelopeJSONRenderer, dumps
 
-from rest_framework.renderers import JSONRenderer
 
-
-class UserJSONRenderer(JSONRenderer):
-    charset = 'utf-8'
+class UserJSONRenderer(EnvelopeJSONRenderer):
+    envelope = 'user'
 
     def render(self, data, accepted_media_type=None, renderer_context=None):
         errors = data.get('errors', None)
 
         if errors:
-            return super(UserJSONRenderer, self).render(data)
-
-        # token = data.get('token', None)
-
-        # if token and isinstance(token, bytes):
-        #     data['token'] = token.decode('utf-8')
-        # else:
-        #     data['token'] = token
-
-        return json.dumps({
-            'user': data
-        })
-
+            return dumps(data)
 
+        return super(UserJSONRenderer, self).render(data, accepted_media_type, renderer_context)
@@ -61,7 +61,7 @@ class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         # fields = ('email', 'username', 'password', 'token', 'last_name', 'first_name')
-        fields = ('email', 'username', 'password', 'last_name', 'first_name')
+        fields = ('email', 'username', 'password', 'last_name', 'first_name', 'reviews_count')
 
         # Параметр read_only_fields является альтернативой явному указанию поля
         # с помощью read_only = True, как мы это делали для пароля выше.
@@ -81,9 +81,12 @@ class UserSerializer(serializers.ModelSerializer):
             # в текущий экземпляр User по одному.
             setattr(instance, key, value)
 
+        # Only the edited fields: the instance may come from the token cache, other values can be stale.
+        update_fields = list(validated_data)
         if password is not None:
             instance.set_password(password)
+            update_fields.append('password')
 
-        instance.save()
+        instance.save(update_fields=update_fields)
 
         return instance
\ No newline at end of file
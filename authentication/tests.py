@@ -1,3 +1,73 @@
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
 
-# Create your tests here.
+from authentication.cache import TokenCache, token_cache
+from users.models import User
+
+
+class TokenCacheTest(TestCase):
+    """ Shared user snapshots of TokenCache and their invalidation. """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', email='reader@example.com', password='password')
+
+    def setUp(self):
+        cache.clear()
+        self.token_cache = TokenCache(maxsize=10, local_ttl=60, shared_ttl=60)
+
+    def test_fill_racing_with_invalidation(self):
+        """ A snapshot loaded before an invalidation is not shared under the new version. """
+        version = self.token_cache.user_version(self.user.id)
+        self.token_cache.invalidate_user(self.user.id)
+        self.token_cache.set(self.user.token, self.user, version=version)
+        self.assertIsNone(self.token_cache.get_by_id(self.user.id, self.token_cache.user_version(self.user.id)))
+
+
+class TokenCacheInvalidationTest(TestCase):
+    """ Saving or deleting a user drops its cached snapshots, the next request sees the change. """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', email='reader@example.com', password='password')
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.token = self.user.token
+        self.client.defaults['REMOTE_ADDR'] = '10.0.0.1'
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Token {self.token}'
+        self.assertEqual(self.client.get(reverse('api:list-books')).status_code, 200)
+
+    def assertCached(self, cached):
+        shared = token_cache.get_by_id(self.user.id, token_cache.user_version(self.user.id))
+        self.assertEqual(token_cache.get_by_token(self.token) is not None, cached)
+        self.assertEqual(shared is not None, cached)
+
+    def test_cached(self):
+        self.assertCached(True)
+        user = token_cache.get_by_id(self.user.id, token_cache.user_version(self.user.id))
+        self.assertIn('password', user.get_deferred_fields())
+
+    def test_password_change(self):
+        self.user.set_password('new-password')
+        self.user.save(update_fields=['password'])
+        self.assertCached(False)
+
+    def test_deactivation(self):
+        self.user.is_active = False
+        self.user.save()
+        self.assertCached(False)
+        self.assertEqual(self.client.get(reverse('api:list-books')).status_code, 403)
+
+    def test_deletion(self):
+        self.user.delete()
+        self.assertCached(False)
+        self.assertEqual(self.client.get(reverse('api:list-books')).status_code, 403)
+
+    def test_last_login_keeps_cache(self):
+        self.user.last_login = timezone.now()
+        self.user.save(update_fields=['last_login'])
+        self.assertCached(True)
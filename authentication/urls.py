@@ -5,5 +5,6 @@ from . import views
 urlpatterns = [
     path('user/', views.UserRetrieveUpdateAPIView.as_view(), name='edit-user'),
     path('users/signup', views.UserRegistrationAPIView.as_view(), name='create-user'),
-    path('users/login', views.UserLoginAPIView.as_view(), name='login')
+    path('users/login', views.UserLoginAPIView.as_view(), name='login'),
+    path('auth/cache-stats', views.TokenCacheStatsAPIView.as_view(), name='token-cache-stats'),
 ]
@@ -1,10 +1,11 @@
 from rest_framework import status
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.generics import RetrieveUpdateAPIView
 
 from .serializers import UserRegistrationSerializer, UserLoginSerializer, UserSerializer
+from .cache import token_cache
 from .renderers import UserJSONRenderer
 
 
@@ -56,4 +57,12 @@ class UserRetrieveUpdateAPIView(RetrieveUpdateAPIView):
         serializer.is_valid(raise_exception=True)
         serializer.save()
 
-        return Response(serializer.data, status=status.HTTP_200_OK)
\ No newline at end of file
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class TokenCacheStatsAPIView(APIView):
+    """ Hit/miss counters of the JWT token cache of the current process. """
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(token_cache.stats(), status=status.HTTP_200_OK)
\ No newline at end of file
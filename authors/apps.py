@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.db.models import CharField
+from django.db.models.signals import pre_migrate
 
 
 class AuthorsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'authors'
+
+    def ready(self):
+        from .search import TrigramWordSimilar
+        from .signals import create_pg_extensions
+
+        CharField.register_lookup(TrigramWordSimilar)
+        pre_migrate.connect(create_pg_extensions, sender=self)
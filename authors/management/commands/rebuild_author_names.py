@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Value
+from django.db.models.functions import Concat
+
+from authors.models import Author
+
+
+class Command(BaseCommand):
+    help = 'Fill Author.full_name (used by trigram search) in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id, total = 0, 0
+        while True:
+            ids = list(Author.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            total += Author.objects.filter(id__in=ids).update(full_name=Concat('first_name', Value(' '), 'last_name'))
+            last_id = ids[-1]
+            self.stdout.write(f'Updated {total} authors...')
+
+        self.stdout.write(self.style.SUCCESS(f'Done. {total} authors were updated.'))
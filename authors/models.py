@@ -1,3 +1,4 @@
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 from django.urls import reverse
 
@@ -9,6 +10,15 @@ class Author(models.Model):
     last_name = models.CharField(max_length=100)
     description = models.TextField(max_length=2000, blank=True, null=True)
     user = models.OneToOneField(User, blank=True, null=True, on_delete=models.CASCADE)
+    full_name = models.CharField(max_length=201, default='', editable=False)
+    books_count = models.PositiveIntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['full_name'], opclasses=['gin_trgm_ops'], name='author_full_name_trgm_idx'),
+            models.Index(fields=['last_name', 'id'], name='author_last_name_id_idx'),
+        ]
 
     def __str__(self):
         return f'{self.first_name} {self.last_name}'
@@ -18,3 +28,11 @@ class Author(models.Model):
 
     def get_full_name(self):
         return f'{self.first_name} {self.last_name}'
+
+    def save(self, *args, **kwargs):
+        """ Keep full_name (used by trigram search) in sync with first and last names. """
+        self.full_name = self.get_full_name()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'first_name', 'last_name'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'full_name'}
+        super(Author, self).save(*args, **kwargs)
@@ -0,0 +1,42 @@
+import re
+
+from django.conf import settings
+from django.contrib.postgres.lookups import PostgresOperatorLookup
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models import F, FloatField, Func, Value
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class TrigramWordSimilar(PostgresOperatorLookup):
+    """ 'field %> value' - true if value is similar to any word sequence of the field. Uses trigram index. """
+    lookup_name = 'trigram_word_similar'
+    postgres_operator = '%%>'
+
+
+class TrigramWordSimilarity(Func):
+    """ WORD_SIMILARITY(string, expression) - the greatest similarity between string and a part of expression. """
+    function = 'WORD_SIMILARITY'
+    output_field = FloatField()
+
+    def __init__(self, string, expression, **extra):
+        super().__init__(Value(string), expression, **extra)
+
+
+def search_authors(queryset, query):
+    """
+    Fuzzy search of authors by full name, tolerant to typos and word order ('Tolstoi Leo').
+    Every query word should be similar to a part of the name, results are ranked by similarity
+    and limited by AUTHOR_SEARCH_MAX_RESULTS to keep the response time bounded.
+    """
+    words = WORD_RE.findall(query)
+    if not words:
+        return queryset.none()
+
+    for word in words:
+        queryset = queryset.filter(full_name__trigram_word_similar=word)
+    normalized_query = ' '.join(words)
+    return queryset.annotate(
+        similarity=TrigramSimilarity('full_name', normalized_query) +
+        TrigramWordSimilarity(normalized_query, F('full_name'))
+    ).order_by('-similarity', 'last_name', 'id')[:settings.AUTHOR_SEARCH_MAX_RESULTS]
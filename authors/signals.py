@@ -0,0 +1,8 @@
+from django.db import connections
+
+
+def create_pg_extensions(sender, using='default', **kwargs):
+    """ pg_trgm is required by the trigram index of Author.full_name, create it before migrations run. """
+    if connections[using].vendor == 'postgresql':
+        with connections[using].cursor() as cursor:
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
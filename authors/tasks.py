@@ -0,0 +1,16 @@
+from django.db.models.functions import Now
+
+from books.models import Book
+from books.search import update_search_vector
+from jobs.queue import task
+
+
+@task()
+def refresh_author_books(author_id):
+    """
+    After a rename: author names are a part of the book search vector, authors_display and book pages,
+    recompute and touch them.
+    """
+    book_ids = list(Book.objects.filter(authors=author_id).values_list('id', flat=True))
+    update_search_vector(book_ids)
+    Book.objects.filter(id__in=book_ids).update_authors_display(updated_at=Now())
@@ -1,3 +1,37 @@
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from authors.models import Author
+from books.models import Book
+from users.models import User
+
+
+class AuthorViewsQueriesTest(TestCase):
+    """ The test runner checks views in strict N+1 mode, pages with many related rows must not repeat queries. """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', email='reader@example.com', password='password')
+        cls.authors = [Author.objects.create(first_name='Ann', last_name=f'Writer{number}') for number in range(8)]
+        for number in range(8):
+            book = Book.objects.create(title=f'Book {number}')
+            book.authors.add(*cls.authors)
+
+    def setUp(self):
+        self.client.defaults['REMOTE_ADDR'] = '10.0.0.1'
+        self.client.force_login(self.user)
+
+    def test_list(self):
+        response = self.client.get(reverse('authors:list-authors'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['authors']), 8)
+
+    def test_search(self):
+        response = self.client.get(reverse('authors:search-authors'), {'authors-search': 'writer'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['authors']), 8)
+
+    def test_detail(self):
+        response = self.client.get(reverse('authors:detail-author', kwargs={'pk': self.authors[0].id}))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Book 7')
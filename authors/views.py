@@ -1,6 +1,6 @@
 from django.urls import reverse
 from django.http import Http404
-from django.db.models import Q
+from django.utils.decorators import method_decorator
 from django.views.generic import ListView, DetailView, CreateView, UpdateView
 from django.contrib.auth.mixins import PermissionRequiredMixin, LoginRequiredMixin
 from django.contrib.auth.models import Group
@@ -9,25 +9,33 @@ from django.contrib import messages
 
 from books.utils import IsOwnerOrStaff
 from authors.models import Author
+from config.conditional import conditional_content
+from config.pagination import KeysetPaginationMixin
 from .forms import AuthorForm
+from .search import search_authors
 
 
-class AuthorListView(ListView):
+@method_decorator(conditional_content, name='dispatch')
+class AuthorListView(KeysetPaginationMixin, ListView):
     model = Author
     context_object_name = 'authors'
     paginate_by = 10
+    keyset_ordering = ('last_name', 'id')
+
+    def get_keyset_ordering(self):
+        """ Search results are ordered by similarity, so they use regular pagination. """
+        if self.request.GET.get('authors-search'):
+            return None
+        return self.keyset_ordering
 
     def get_queryset(self):
         """ Return Author list with searching parameters or all objects. """
         search_query = self.request.GET.get('authors-search')
         ordering = 'last_name'
-        pref_related = 'books'
         if search_query:
-            queryset = Author.objects.filter(
-                Q(first_name__icontains=search_query) | Q(last_name__icontains=search_query)).order_by(ordering).\
-                prefetch_related(pref_related)
+            queryset = search_authors(Author.objects.all(), search_query)
         else:
-            queryset = Author.objects.all().order_by(ordering).prefetch_related(pref_related)
+            queryset = Author.objects.all().order_by(ordering)
         return queryset
 
     def get_context_data(self, *args, **kwargs):
@@ -6,10 +6,6 @@ from .models import Book, ReviewComment, BookReview
 class BooksAdmin(admin.ModelAdmin):
     filter_horizontal = ('authors',)
 
-    def get_queryset(self, request):
-        queryset = super(BooksAdmin, self).get_queryset(request).prefetch_related('authors')
-        return queryset
-
 
 class BookReviewAdmin(admin.ModelAdmin):
     fields = ('body', 'book')
@@ -0,0 +1,56 @@
+"""
+Bulk write helpers for commands which load many rows at once (import_catalog, seed_data, reconcile_counters).
+"""
+import io
+
+from django.db import connection
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def _copy_value(value):
+    if value is None:
+        return '\\N'
+    if isinstance(value, str):
+        return '"' + value.replace('"', '""') + '"'
+    return str(value)
+
+
+def copy_objects(model, objs):
+    """
+    Insert objs with Postgres COPY. Primary keys are taken from the sequence if they are not set
+    (use allocate_ids to know them in advance). Values are prepared by the model fields,
+    so defaults and auto_now_add work as with save().
+    """
+    if not objs:
+        return
+    fields = [field for field in model._meta.concrete_fields if not field.primary_key or objs[0].pk is not None]
+    buffer = io.StringIO()
+    for obj in objs:
+        values = (field.get_db_prep_save(field.pre_save(obj, add=True), connection) for field in fields)
+        buffer.write(','.join(_copy_value(value) for value in values))
+        buffer.write('\n')
+    buffer.seek(0)
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+    with connection.cursor() as cursor:
+        table = connection.ops.quote_name(model._meta.db_table)
+        cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
+
+
+def allocate_ids(model, count):
+    """ Reserve count primary keys from the table sequence. """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)',
+            [model._meta.db_table, model._meta.pk.column, count]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def count_subquery(model, fk_field):
+    """ COUNT(*) of model rows which fk_field points to the outer row. """
+    return Coalesce(Subquery(
+        model.objects.filter(**{fk_field: OuterRef('pk')}).order_by().values(fk_field).annotate(
+            total=Count('*')).values('total'),
+        output_field=IntegerField()
+    ), Value(0))
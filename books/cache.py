@@ -0,0 +1,63 @@
+import hashlib
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from config.cache import bump_version, get_version
+from config.metrics import record_cache
+from config.pagination import decode_cursor, encode_cursor
+
+CSRF_PLACEHOLDER = '__csrf_token_placeholder__'
+# Edit/Delete links of a review or comment in the shared html: <!--owner-actions:{user id}-->...<!--/owner-actions-->
+OWNER_ACTIONS_RE = re.compile(r'<!--owner-actions:(\d+)-->(.*?)<!--/owner-actions-->', re.S)
+
+
+def _version_key(book_id):
+    return f'books:thread-version:{book_id}'
+
+
+def get_thread_version(book_id):
+    """ Current version of a book review thread. """
+    return get_version(_version_key(book_id))
+
+
+def bump_thread_version(book_id):
+    """ Invalidate the cached review thread of a book. """
+    bump_version(_version_key(book_id))
+
+
+def owner_actions(html, user):
+    """ Keep the owner links of html which the user may use (staff all of them), drop the rest. """
+    def replace(match):
+        return match.group(2) if user.is_staff or str(user.pk) == match.group(1) else ''
+    return OWNER_ACTIONS_RE.sub(replace, html)
+
+
+def render_reviews_page(book_id, request, cursor=None):
+    """
+    Return a rendered page of reviews (with the first comments of each) of a book. The html is cached per book
+    version and cursor and shared between users: owner links (see owner_actions) and csrf token are filled in
+    per request. Raises ValueError for a malformed cursor.
+    """
+    from .threads import reviews_page
+
+    page_key = ''
+    if cursor:
+        # The cursor comes from the url: only a valid one gets into the key, hashed to a fixed safe length.
+        page_key = hashlib.sha256(encode_cursor(*decode_cursor(cursor)).encode('ascii')).hexdigest()
+    key = f'books:thread:{book_id}:{get_thread_version(book_id)}:{page_key}'
+    thread = cache.get(key)
+    record_cache('review_thread', thread is not None)
+    if thread is None:
+        thread = render_to_string('books/reviews_list.html', {
+            'book_id': book_id,
+            'reviews': reviews_page(book_id, cursor),
+            'first_page': cursor is None,
+            'csrf_token': CSRF_PLACEHOLDER,
+        })
+        cache.set(key, thread, timeout=settings.REVIEW_THREAD_CACHE_TIMEOUT)
+    return mark_safe(owner_actions(thread, request.user).replace(CSRF_PLACEHOLDER, get_token(request)))
@@ -0,0 +1,53 @@
+import json
+import os
+import random
+import tempfile
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+
+class Command(BaseCommand):
+    help = ('Measure import_catalog throughput on a generated catalog (1M books by default). '
+            'Everything is imported inside a transaction which is rolled back at the end.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=1_000_000)
+        parser.add_argument('--authors', type=int, default=200_000)
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--mode', choices=['insert', 'copy', 'both'], default='both')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def generate(self, path, books, authors, seed):
+        """ Write a jsonl catalog with 1-3 authors per book and ~1% duplicated isbn13. """
+        rnd = random.Random(seed)
+        with open(path, 'w', encoding='utf-8') as file:
+            for i in range(books):
+                isbn = 9780000000000 + (rnd.randrange(i) if i and rnd.random() < 0.01 else i)
+                file.write(json.dumps({
+                    'isbn13': str(isbn),
+                    'title': f'Generated book {i}',
+                    'description': f'Description of the generated book number {i}. ' * 3,
+                    'popularity_rank': rnd.randint(1, 10),
+                    'authors': [f'Author{a} Surname{a}' for a in rnd.sample(range(authors), rnd.randint(1, 3))],
+                }))
+                file.write('\n')
+
+    def handle(self, *args, **options):
+        modes = ['insert', 'copy'] if options['mode'] == 'both' else [options['mode']]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'catalog.jsonl')
+            self.stdout.write(f'Generating {options["books"]} books...')
+            self.generate(path, options['books'], options['authors'], options['seed'])
+
+            for mode in modes:
+                started = time.monotonic()
+                with transaction.atomic(), open(os.devnull, 'w') as devnull:
+                    call_command('import_catalog', path, batch_size=options['batch_size'], copy=mode == 'copy',
+                                 no_checkpoint=True, stdout=devnull)
+                    elapsed = time.monotonic() - started
+                    transaction.set_rollback(True)
+                self.stdout.write(self.style.SUCCESS(
+                    f'{mode:>6}: {options["books"]} rows in {elapsed:.1f}s, {options["books"] / elapsed:.0f} rows/sec'))
@@ -0,0 +1,220 @@
+import json
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.urls import reverse
+
+from authors.models import Author
+from books.models import Book, BookReview, ReviewComment
+from config.metrics import percentile
+from users.models import User
+
+BENCHMARK_USERNAME = 'benchmark'
+
+
+class Command(BaseCommand):
+    help = ('Request every page of books, authors, users and api (GET only, the async api views if API_ASYNC_VIEWS '
+            'is on) and record p50/p99 latency, query count and peak memory per view. '
+            'Fails if a number regresses beyond --baseline.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='Timed requests per view.')
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--only', nargs='*', help='Names of views to run, e.g. books:list-book api:list-books.')
+        parser.add_argument('--output', help='Write the results as json.')
+        parser.add_argument('--baseline', help='Results json to compare with.')
+        parser.add_argument('--save-baseline', action='store_true', help='Write the results to --baseline.')
+        parser.add_argument('--latency-threshold', type=float, default=0.25, help='Allowed relative latency growth.')
+        parser.add_argument('--latency-slack', type=float, default=2.0, help='Latency growth in ms always allowed.')
+        parser.add_argument('--memory-threshold', type=float, default=0.25, help='Allowed relative memory growth.')
+        parser.add_argument('--queries-threshold', type=int, default=0, help='Allowed number of extra queries.')
+
+    def get_user(self):
+        """ Staff superuser, so every edit and delete page is reachable. """
+        user = User.objects.filter(username=BENCHMARK_USERNAME).first()
+        if user is None:
+            user = User.objects.create_superuser(BENCHMARK_USERNAME, 'benchmark@example.com', 'benchmark-password')
+        return user
+
+    def get_targets(self, user):
+        """ (view name, url, 'html', 'api' or 'api-gzip') for every GET page, on the most reviewed book. """
+        book = Book.objects.order_by('-reviews_count', 'id').first()
+        author = Author.objects.order_by('-books_count', 'id').first()
+        if book is None or author is None:
+            raise CommandError('There is no data, run seed_data first.')
+        review = BookReview.objects.filter(book=book).order_by('-comments_count', 'id').first()
+        comment = ReviewComment.objects.filter(review=review).order_by('id').first() if review else None
+        word = book.title.split()[0]
+        # A full batch, the most expensive request a client can make
+        book_ids = ','.join(map(str, Book.objects.visible().order_by('id').values_list('id', flat=True)
+                                [:settings.API_BATCH_LIMIT]))
+        author_ids = ','.join(map(str, Author.objects.order_by('id').values_list('id', flat=True)
+                                  [:settings.API_BATCH_LIMIT]))
+
+        targets = [
+            ('books:list-book', reverse('books:list-book'), 'html'),
+            ('books:search-books', f'{reverse("books:search-books")}?book-search={word}', 'html'),
+            ('books:detail-book', reverse('books:detail-book', args=[book.id]), 'html'),
+            ('books:edit-book', reverse('books:edit-book', args=[book.id]), 'html'),
+            ('books:create-book', reverse('books:create-book'), 'html'),
+            ('books:delete-book', reverse('books:delete-book', args=[book.id]), 'html'),
+            ('books:add-review', reverse('books:add-review', args=[book.id]), 'html'),
+            ('books:reviews-fragment', reverse('books:reviews-fragment', args=[book.id]), 'html'),
+            ('authors:list-authors', reverse('authors:list-authors'), 'html'),
+            ('authors:search-authors', f'{reverse("authors:search-authors")}?authors-search={author.last_name}',
+             'html'),
+            ('authors:detail-author', reverse('authors:detail-author', args=[author.id]), 'html'),
+            ('authors:create-author', reverse('authors:create-author'), 'html'),
+            ('authors:update-author', reverse('authors:update-author', args=[author.id]), 'html'),
+            ('users:profile-user', reverse('users:profile-user', args=[user.id]), 'html'),
+            ('users:edit-user', reverse('users:edit-user', args=[user.id]), 'html'),
+            ('users:change-password', reverse('users:change-password', args=[user.id]), 'html'),
+            ('api:list-books', reverse('api:list-books'), 'api'),
+            ('api:list-books-search', f'{reverse("api:list-books")}?search={word}', 'api'),
+            ('api:detail-book', reverse('api:detail-book', args=[book.id]), 'api'),
+            ('api:book-reviews', reverse('api:book-reviews', args=[book.id]), 'api'),
+            ('api:list-authors', '/api/authors/', 'api'),
+            ('api:detail-author', f'/api/authors/{author.id}', 'api'),
+            ('api:batch-books', f'{reverse("api:batch-books")}?ids={book_ids}', 'api'),
+            ('api:batch-authors', f'{reverse("api:batch-authors")}?ids={author_ids}', 'api'),
+            ('api:catalog-export-books', reverse('api:catalog-export', args=['books']), 'api'),
+            ('api:catalog-export-books-csv-gzip', f'{reverse("api:catalog-export", args=["books"])}?output=csv',
+             'api-gzip'),
+            ('api:catalog-export-authors', reverse('api:catalog-export', args=['authors']), 'api'),
+            ('api:catalog-export-reviews', reverse('api:catalog-export', args=['reviews']), 'api'),
+            ('authentication:edit-user', reverse('authentication:edit-user'), 'api'),
+        ]
+        if settings.API_ASYNC_VIEWS:
+            targets += [
+                ('api:async-list-books', reverse('api:async-list-books'), 'api'),
+                ('api:async-detail-book', reverse('api:async-detail-book', args=[book.id]), 'api'),
+                ('api:async-list-authors', reverse('api:async-list-authors'), 'api'),
+                ('api:async-detail-author', reverse('api:async-detail-author', args=[author.id]), 'api'),
+            ]
+        if review is not None:
+            targets += [
+                ('books:edit-review', reverse('books:edit-review', args=[book.id, review.id]), 'html'),
+                ('books:delete-review', reverse('books:delete-review', args=[book.id, review.id]), 'html'),
+                ('books:add-comment', reverse('books:add-comment', args=[book.id, review.id]), 'html'),
+                ('books:comments-fragment', reverse('books:comments-fragment', args=[book.id, review.id]), 'html'),
+                ('api:review-comments', reverse('api:review-comments', args=[review.id]), 'api'),
+            ]
+        if comment is not None:
+            targets += [
+                ('books:add-reply-comment', reverse('books:add-reply-comment', args=[book.id, review.id, comment.id]),
+                 'html'),
+                ('books:edit-comment', reverse('books:edit-comment', args=[book.id, comment.id]), 'html'),
+                ('books:delete-comment', reverse('books:delete-comment', args=[book.id, comment.id]), 'html'),
+            ]
+        return targets
+
+    def request(self, client, url, headers):
+        response = client.get(url, **headers)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        if response.status_code != 200:
+            raise CommandError(f'GET {url} returned {response.status_code}.')
+        return response
+
+    def measure(self, client, url, headers, options):
+        for _ in range(options['warmup']):
+            self.request(client, url, headers)
+
+        timings = []
+        for _ in range(options['requests']):
+            started = time.perf_counter()
+            self.request(client, url, headers)
+            timings.append((time.perf_counter() - started) * 1000)
+
+        # Query counting and tracemalloc slow requests down, so they are measured separately.
+        # (CaptureQueriesContext does not work here, connection.queries is reset on request_started.)
+        queries, wrapped = [], []
+
+        def count(execute, sql, *args):
+            queries.append(sql)
+            return execute(sql, *args)
+
+        def count_in_thread(sender, connection, **kwargs):
+            # The async views query from pool threads, which open their own connections.
+            if count not in connection.execute_wrappers:
+                connection.execute_wrappers.append(count)
+                wrapped.append(connection)
+
+        connection_created.connect(count_in_thread)
+        try:
+            with connection.execute_wrapper(count):
+                self.request(client, url, headers)
+        finally:
+            connection_created.disconnect(count_in_thread)
+            for other in wrapped:
+                other.execute_wrappers.remove(count)
+        tracemalloc.start()
+        try:
+            self.request(client, url, headers)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'p50_ms': round(percentile(timings, 0.5), 2),
+            'p99_ms': round(percentile(timings, 0.99), 2),
+            'queries': len(queries),
+            'peak_kb': round(peak / 1024, 1),
+        }
+
+    def compare(self, results, baseline, options):
+        """ Return the list of regressions against baseline. """
+        regressions = []
+        for name, result in results.items():
+            old = baseline.get(name)
+            if old is None:
+                continue
+            for key in ('p50_ms', 'p99_ms'):
+                if result[key] > old[key] * (1 + options['latency_threshold']) + options['latency_slack']:
+                    regressions.append(f'{name}: {key} {old[key]} -> {result[key]}')
+            if result['queries'] > old['queries'] + options['queries_threshold']:
+                regressions.append(f'{name}: queries {old["queries"]} -> {result["queries"]}')
+            if result['peak_kb'] > old['peak_kb'] * (1 + options['memory_threshold']):
+                regressions.append(f'{name}: peak_kb {old["peak_kb"]} -> {result["peak_kb"]}')
+        return regressions
+
+    def handle(self, *args, **options):
+        if options['save_baseline'] and not options['baseline']:
+            raise CommandError('--save-baseline requires --baseline.')
+        user = self.get_user()
+        # Not an INTERNAL_IPS address, so the debug toolbar does not take part in the numbers.
+        html_client = Client(REMOTE_ADDR='10.0.0.1')
+        html_client.force_login(user)
+        api_client = Client(REMOTE_ADDR='10.0.0.1')
+        headers = {'html': {}, 'api': {'HTTP_AUTHORIZATION': f'Token {user.token}'}}
+        headers['api-gzip'] = {**headers['api'], 'HTTP_ACCEPT_ENCODING': 'gzip'}
+
+        results = {}
+        self.stdout.write(f'{"view":<36}{"p50 ms":>10}{"p99 ms":>10}{"queries":>10}{"peak KB":>12}')
+        for name, url, kind in self.get_targets(user):
+            if options['only'] and name not in options['only']:
+                continue
+            client = html_client if kind == 'html' else api_client
+            result = results[name] = self.measure(client, url, headers[kind], options)
+            self.stdout.write(f'{name:<36}{result["p50_ms"]:>10}{result["p99_ms"]:>10}'
+                              f'{result["queries"]:>10}{result["peak_kb"]:>12}')
+
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(results, file, indent=2, sort_keys=True)
+
+        if options['baseline'] and options['save_baseline']:
+            with open(options['baseline'], 'w') as file:
+                json.dump(results, file, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f'Baseline saved to {options["baseline"]}.'))
+        elif options['baseline']:
+            with open(options['baseline']) as file:
+                regressions = self.compare(results, json.load(file), options)
+            if regressions:
+                raise CommandError('Regressions:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regressions.'))
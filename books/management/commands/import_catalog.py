@@ -0,0 +1,251 @@
+import csv
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models.functions import Now
+
+from authors.models import Author
+from books.bulk import allocate_ids, copy_objects, count_subquery
+from books.models import Book
+from books.search import update_search_vector
+
+BookAuthor = Book.authors.through
+
+
+def read_rows(path, file_format):
+    """
+    Yield (line number, row dict). Authors are a list in jsonl and a ';' separated string in csv.
+    A line which is not valid json is yielded as None.
+    """
+    with open(path, encoding='utf-8', newline='') as file:
+        if file_format == 'jsonl':
+            for number, line in enumerate(file, start=1):
+                if line.strip():
+                    try:
+                        yield number, json.loads(line)
+                    except ValueError:
+                        yield number, None
+        else:
+            for number, row in enumerate(csv.DictReader(file), start=1):
+                row['authors'] = [name for name in (row.get('authors') or '').split(';') if name.strip()]
+                yield number, row
+
+
+def _max_length(model, name):
+    return model._meta.get_field(name).max_length
+
+
+def clean_row(row):
+    """ Return the row with checked and normalized values, raise ValueError if it can not be imported. """
+    if not isinstance(row, dict):
+        raise ValueError('not an object')
+    title = row.get('title')
+    if not isinstance(title, str) or not title.strip():
+        raise ValueError('no title')
+    if len(title) > _max_length(Book, 'title'):
+        raise ValueError('title is too long')
+    isbn13 = str(row.get('isbn13') or '').strip() or None
+    if isbn13 is not None and len(isbn13) > _max_length(Book, 'isbn13'):
+        raise ValueError(f'isbn13 "{isbn13}" is too long')
+    description = row.get('description') or None
+    if description is not None and not isinstance(description, str):
+        raise ValueError('description is not a string')
+    try:
+        popularity_rank = int(row.get('popularity_rank') or 1)
+    except (TypeError, ValueError):
+        raise ValueError(f'popularity_rank "{row.get("popularity_rank")}" is not a number')
+    authors = row.get('authors') or []
+    if not isinstance(authors, list) or not all(isinstance(name, str) for name in authors):
+        raise ValueError('authors is not a list of names')
+    authors = [name.strip() for name in authors if name.strip()]
+    if any(len(part) > _max_length(Author, 'last_name') for name in authors for part in split_name(name)):
+        raise ValueError('author name is too long')
+    return {
+        'isbn13': isbn13,
+        'title': title,
+        'description': description,
+        'popularity_rank': min(max(popularity_rank, 1), 10),
+        'authors': authors,
+    }
+
+
+def split_name(name):
+    """ 'Leo Nikolayevich Tolstoy' -> ('Leo Nikolayevich', 'Tolstoy') """
+    parts = name.strip().rsplit(' ', 1)
+    return ('', parts[0]) if len(parts) == 1 else (parts[0], parts[1])
+
+
+class Command(BaseCommand):
+    help = 'Bulk import books and authors from a csv or jsonl file. Deduplicates on isbn13 and author name.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Default: by file extension.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--copy', action='store_true', help='Use COPY instead of INSERT (faster for large loads).')
+        parser.add_argument('--resume', action='store_true', help='Continue after the last committed batch.')
+        parser.add_argument('--report-malformed', type=int, default=20, metavar='N',
+                            help='Print the first N skipped malformed rows (all of them are counted).')
+        parser.add_argument('--no-checkpoint', action='store_true', help='Do not write a checkpoint file.')
+        parser.add_argument('--skip-search-index', action='store_true',
+                            help='Do not compute search vectors (run rebuild_search_index later).')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'File "{path}" does not exist.')
+        if options['copy'] and connection.vendor != 'postgresql':
+            raise CommandError('--copy requires PostgreSQL.')
+        file_format = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+
+        self.options = options
+        self.checkpoint_path = f'{path}.checkpoint'
+        start_line = self.read_checkpoint() if options['resume'] else 0
+        if start_line:
+            self.stdout.write(f'Resuming after line {start_line}.')
+
+        self.stats = {'rows': 0, 'books': 0, 'authors': 0, 'links': 0, 'duplicates': 0, 'malformed': 0}
+        self.started = time.monotonic()
+        self.last_line = start_line
+        batch = []
+        for number, row in read_rows(path, file_format):
+            if number <= start_line:
+                continue
+            try:
+                batch.append(clean_row(row))
+            except ValueError as error:
+                self.stats['malformed'] += 1
+                if self.stats['malformed'] <= self.options['report_malformed']:
+                    self.stderr.write(f'Line {number} skipped: {error}.')
+                continue
+            if len(batch) == options['batch_size']:
+                self.import_batch(batch, number)
+                batch = []
+        if batch:
+            self.import_batch(batch, number)
+
+        if not options['no_checkpoint'] and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        self.stdout.write(self.style.SUCCESS(f'Done. {self.progress()}'))
+
+    def read_checkpoint(self):
+        """
+        Line number after which to continue. The checkpoint of a batch is written before its commit: if the last
+        book of the batch is not in the database, the batch was rolled back and is imported again.
+        Books without isbn13 are not deduplicated, so the line number alone decides which rows are done.
+        """
+        try:
+            with open(self.checkpoint_path) as file:
+                checkpoint = json.loads(file.read() or '0')
+        except FileNotFoundError:
+            return 0
+        if isinstance(checkpoint, int):  # written by an older version after the commit
+            return checkpoint
+        if checkpoint['book_id'] is None or Book.objects.filter(id=checkpoint['book_id']).exists():
+            return checkpoint['line']
+        return checkpoint['previous_line']
+
+    def write_checkpoint(self, line_number, book_id):
+        """ Replace the checkpoint file atomically, a crash while writing it leaves the previous one. """
+        if not self.options['no_checkpoint']:
+            checkpoint = {'line': line_number, 'previous_line': self.last_line, 'book_id': book_id}
+            with open(f'{self.checkpoint_path}.tmp', 'w') as file:
+                json.dump(checkpoint, file)
+            os.replace(f'{self.checkpoint_path}.tmp', self.checkpoint_path)
+
+    def progress(self):
+        elapsed = time.monotonic() - self.started
+        rate = self.stats['rows'] / elapsed if elapsed else 0
+        return (f'{self.stats["rows"]} rows ({rate:.0f} rows/sec): {self.stats["books"]} books, '
+                f'{self.stats["authors"]} authors, {self.stats["links"]} links, '
+                f'{self.stats["duplicates"]} duplicate books and {self.stats["malformed"]} malformed rows skipped, '
+                f'{elapsed:.1f}s')
+
+    def import_batch(self, rows, last_line):
+        with transaction.atomic():
+            authors = self.get_or_create_authors(rows)
+            books, book_authors = self.build_books(rows, authors)
+            links = [BookAuthor(book_id=book.id, author_id=author_id) for book, author_ids in zip(books, book_authors)
+                     for author_id in author_ids]
+            if self.options['copy']:
+                copy_objects(BookAuthor, links)
+            else:
+                BookAuthor.objects.bulk_create(links, batch_size=self.options['batch_size'])
+
+            # Bulk inserts do not send signals, so keep denormalized data up to date here.
+            book_ids = [book.id for book in books]
+            if not self.options['skip_search_index']:
+                update_search_vector(book_ids)
+            touched_authors = {link.author_id for link in links}
+            Author.objects.filter(id__in=touched_authors).update(
+                books_count=count_subquery(BookAuthor, 'author'), updated_at=Now())
+            self.write_checkpoint(last_line, max(book_ids, default=None))
+
+        self.last_line = last_line
+        self.stats['rows'] += len(rows)
+        self.stats['books'] += len(books)
+        self.stats['links'] += len(links)
+        self.stdout.write(self.progress())
+
+    def get_or_create_authors(self, rows):
+        """ Return {author name from the file: (author id, full name)} for the rows, creating missing authors. """
+        authors = {}  # full name -> unsaved Author
+        full_names = {}  # name from the file -> full name
+        for name in {name for row in rows for name in row['authors']}:
+            first_name, last_name = split_name(name)
+            author = Author(first_name=first_name, last_name=last_name)
+            author.full_name = author.get_full_name()
+            full_names[name] = author.full_name
+            authors.setdefault(author.full_name, author)
+
+        # Ordered by -id, so the oldest author wins if there are duplicates in the table already.
+        ids = dict(Author.objects.filter(full_name__in=authors).order_by('-id').values_list('full_name', 'id'))
+        missing = [author for full_name, author in authors.items() if full_name not in ids]
+        if missing:
+            if self.options['copy']:
+                for author, author_id in zip(missing, allocate_ids(Author, len(missing))):
+                    author.id = author_id
+                copy_objects(Author, missing)
+            else:
+                Author.objects.bulk_create(missing, batch_size=self.options['batch_size'])
+            ids.update((author.full_name, author.id) for author in missing)
+            self.stats['authors'] += len(missing)
+
+        return {name: (ids[full_name], full_name) for name, full_name in full_names.items()}
+
+    def build_books(self, rows, authors):
+        """
+        Insert books of the rows skipping isbn13 duplicates. Return books and ids of their authors in the order
+        of the file, links are inserted in this order, so authors_display is the same as the one of signals.
+        """
+        isbns = {row['isbn13'] for row in rows if row['isbn13']}
+        seen = set(Book.objects.filter(isbn13__in=isbns).values_list('isbn13', flat=True))
+
+        books, book_authors = [], []
+        for row in rows:
+            isbn13 = row['isbn13']
+            if isbn13 in seen:
+                self.stats['duplicates'] += 1
+                continue
+            if isbn13:
+                seen.add(isbn13)
+            names = dict(authors[name] for name in row['authors'])  # id -> name
+            books.append(Book(
+                isbn13=isbn13,
+                title=row['title'],
+                description=row['description'],
+                popularity_rank=row['popularity_rank'],
+                authors_display=', '.join(names.values()),
+            ))
+            book_authors.append(list(names))
+
+        if self.options['copy']:
+            for book, book_id in zip(books, allocate_ids(Book, len(books))):
+                book.id = book_id
+            copy_objects(Book, books)
+        else:
+            Book.objects.bulk_create(books, batch_size=self.options['batch_size'])
+        return books, book_authors
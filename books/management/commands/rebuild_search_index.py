@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from books.models import Book
+from books.search import update_search_vector
+
+
+class Command(BaseCommand):
+    help = 'Recompute full-text search vectors of all books in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--only-missing', action='store_true', help='Index only books without a vector.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        queryset = Book.objects.order_by('id')
+        if options['only_missing']:
+            queryset = queryset.filter(search_vector__isnull=True)
+
+        last_id, total = 0, 0
+        while True:
+            ids = list(queryset.filter(id__gt=last_id).values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            total += update_search_vector(ids)
+            last_id = ids[-1]
+            self.stdout.write(f'Indexed {total} books...')
+
+        self.stdout.write(self.style.SUCCESS(f'Done. {total} books were indexed.'))
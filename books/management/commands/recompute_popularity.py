@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from books.popularity import recompute_all
+
+
+class Command(BaseCommand):
+    help = ('Recompute Book.popularity from reviews, comments and page views of the last POPULARITY["WINDOW_DAYS"], '
+            'in batches. Run it periodically (or the books.recompute_popularity job) and after weight changes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        changed = recompute_all(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{changed} books changed.'))
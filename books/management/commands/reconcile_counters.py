@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from authors.models import Author
+from books.bulk import count_subquery
+from books.models import Book, BookReview, ReviewComment, authors_display_subquery
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Recompute denormalized counters (books, reviews, comments) and Book.authors_display in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def get_counters(self):
+        """ (model, denormalized field, expression computing the real value) """
+        return [
+            (Author, 'books_count', count_subquery(Book.authors.through, 'author')),
+            (Book, 'reviews_count', count_subquery(BookReview, 'book')),
+            (BookReview, 'comments_count', count_subquery(ReviewComment, 'review')),
+            (User, 'reviews_count', count_subquery(BookReview, 'user')),
+            (Book, 'authors_display', authors_display_subquery()),
+        ]
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        for model, field, expression in self.get_counters():
+            last_id, total = 0, 0
+            while True:
+                ids = list(
+                    model.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+                if not ids:
+                    break
+                with transaction.atomic():
+                    total += model.objects.filter(id__in=ids).update(**{field: expression})
+                last_id = ids[-1]
+            self.stdout.write(f'{model.__name__}.{field}: {total} rows reconciled.')
+
+        self.stdout.write(self.style.SUCCESS('Done.'))
@@ -0,0 +1,203 @@
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+from faker import Faker
+
+from authors.models import Author
+from books.bulk import allocate_ids, copy_objects
+from books.models import Book, BookReview, ReviewComment
+from books.search import update_search_vector
+from users.models import User
+
+BookAuthor = Book.authors.through
+
+SCALES = {'small': 10_000, 'medium': 1_000_000, 'large': 10_000_000}
+
+# Share of books with 1, 2, 3 and 4 authors.
+AUTHORS_PER_BOOK = [1, 2, 3, 4]
+AUTHORS_PER_BOOK_WEIGHTS = [75, 18, 5, 2]
+
+
+class Command(BaseCommand):
+    help = ('Generate a realistic dataset: users, authors, books with a skewed author fan-out, '
+            'reviews proportional to popularity and comment threads. Use --scale or --books.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=list(SCALES), default='small',
+                            help=', '.join(f'{name}: {books} books' for name, books in SCALES.items()))
+        parser.add_argument('--books', type=int, help='Overrides --scale.')
+        parser.add_argument('--books-per-author', type=float, default=5.0)
+        parser.add_argument('--books-per-user', type=float, default=20.0)
+        parser.add_argument('--reviews-per-book', type=float, default=2.0, help='Mean, popular books get more.')
+        parser.add_argument('--comments-per-review', type=float, default=1.0, help='Mean of a geometric distribution.')
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--password', default='seed-password', help='Password of every generated user.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--skip-search-index', action='store_true',
+                            help='Do not compute search vectors (run rebuild_search_index later).')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('seed_data requires PostgreSQL.')
+        self.options = options
+        self.rnd = random.Random(options['seed'])
+        self.fake = Faker()
+        self.fake.seed_instance(options['seed'])
+        self.build_pools()
+
+        books = options['books'] or SCALES[options['scale']]
+        authors = max(1, int(books / options['books_per_author']))
+        users = max(10, int(books / options['books_per_user']))
+        self.started = time.monotonic()
+
+        self.user_ids = self.seed_users(users)
+        self.author_ids = self.seed_authors(authors)
+        self.seed_books(books)
+
+        self.stdout.write('Reconciling counters...')
+        call_command('reconcile_counters', batch_size=options['batch_size'], stdout=self.stdout)
+        self.stdout.write('Computing popularity...')
+        call_command('recompute_popularity', batch_size=options['batch_size'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'Done. {users} users, {authors} authors, {books} books in {time.monotonic() - self.started:.1f}s'))
+
+    def build_pools(self):
+        """ Faker is slow for millions of rows, so rows are composed from pools of fake values. """
+        fake = self.fake
+        self.first_names = [fake.first_name() for _ in range(1000)]
+        self.last_names = [fake.last_name() for _ in range(2000)]
+        self.user_names = [fake.user_name() for _ in range(2000)]
+        self.titles = [fake.sentence(nb_words=4).rstrip('.') for _ in range(5000)]
+        self.paragraphs = [fake.paragraph(nb_sentences=5)[:2000] for _ in range(2000)]
+        self.sentences = [fake.sentence(nb_words=12) for _ in range(5000)]
+
+    def batches(self, total):
+        batch_size = self.options['batch_size']
+        for start in range(0, total, batch_size):
+            yield min(batch_size, total - start)
+
+    def insert(self, model, objs):
+        """ COPY objs with ids reserved in advance (unless they are set), so related rows can point to them. """
+        new_objs = [obj for obj in objs if obj.id is None]
+        for obj, obj_id in zip(new_objs, allocate_ids(model, len(new_objs))):
+            obj.id = obj_id
+        copy_objects(model, objs)
+        return [obj.id for obj in objs]
+
+    def spread_dates(self, model, ids, since):
+        """ auto_now_add sets 'now' for every row, spread them between since (sql) and now instead. """
+        model.objects.filter(id__in=ids).update(
+            date_added=RawSQL(f'{since} + random() * (now() - {since})', []))
+
+    def report(self, message):
+        self.stdout.write(f'{message} ({time.monotonic() - self.started:.1f}s)')
+
+    def seed_users(self, total):
+        password = make_password(self.options['password'])
+        ids, created = [], 0
+        offset = User.objects.count()
+        for size in self.batches(total):
+            users = []
+            for number in range(offset + created, offset + created + size):
+                username = f'{self.rnd.choice(self.user_names)}{number}'
+                users.append(User(username=username, email=f'{username}@example.com', password=password,
+                                  first_name=self.rnd.choice(self.first_names),
+                                  last_name=self.rnd.choice(self.last_names)))
+            with transaction.atomic():
+                ids += self.insert(User, users)
+            created += size
+            self.report(f'{created} users')
+        return ids
+
+    def seed_authors(self, total):
+        ids, created = [], 0
+        for size in self.batches(total):
+            authors = []
+            for _ in range(size):
+                author = Author(first_name=self.rnd.choice(self.first_names),
+                                last_name=self.rnd.choice(self.last_names),
+                                description=self.rnd.choice(self.paragraphs) if self.rnd.random() < 0.3 else None)
+                author.full_name = author.get_full_name()
+                authors.append(author)
+            with transaction.atomic():
+                ids += self.insert(Author, authors)
+            created += size
+            self.report(f'{created} authors')
+        return ids
+
+    def pick_author(self):
+        """ A few prolific authors and a long tail: the lower the index the more books. """
+        return self.author_ids[int(len(self.author_ids) * self.rnd.random() ** 3)]
+
+    def seed_books(self, total):
+        created = 0
+        for size in self.batches(total):
+            with transaction.atomic():
+                self.seed_books_batch(size)
+            created += size
+            self.report(f'{created} books')
+
+    def seed_books_batch(self, size):
+        rnd, options = self.rnd, self.options
+        books = [Book(
+            title=rnd.choice(self.titles)[:150],
+            description=rnd.choice(self.paragraphs),
+            popularity_rank=min(10, max(1, int(rnd.gauss(4, 2)))),
+        ) for _ in range(size)]
+        for book, book_id in zip(books, allocate_ids(Book, size)):
+            book.id = book_id
+            book.isbn13 = str(9790000000000 + book_id)
+
+        book_authors = []
+        for book in books:
+            count = rnd.choices(AUTHORS_PER_BOOK, AUTHORS_PER_BOOK_WEIGHTS)[0]
+            book_authors.append(list({self.pick_author() for _ in range(count)}))
+        # Names in the order of the links, as Book.objects.update_authors_display() would set them.
+        names = dict(Author.objects.filter(id__in={author_id for ids in book_authors for author_id in ids})
+                     .values_list('id', 'full_name'))
+        for book, author_ids in zip(books, book_authors):
+            book.authors_display = ', '.join(names[author_id] for author_id in author_ids)
+        copy_objects(Book, books)
+        book_ids = [book.id for book in books]
+
+        links = [BookAuthor(book_id=book.id, author_id=author_id)
+                 for book, author_ids in zip(books, book_authors) for author_id in author_ids]
+        copy_objects(BookAuthor, links)
+        if not options['skip_search_index']:
+            update_search_vector(book_ids)
+
+        # Reviews follow popularity, comments per review are geometric, so there are long threads too.
+        reviews = []
+        for book in books:
+            mean = options['reviews_per_book'] * book.popularity_rank / 4
+            reviews += [BookReview(book_id=book.id, user_id=rnd.choice(self.user_ids), body=rnd.choice(self.sentences))
+                        for _ in range(int(rnd.expovariate(1 / mean)) if mean else 0)]
+        if not reviews:
+            return
+        review_ids = self.insert(BookReview, reviews)
+        self.spread_dates(BookReview, review_ids, "now() - interval '365 days'")
+
+        threads = []
+        probability = 1 / (1 + options['comments_per_review'])
+        for review in reviews:
+            thread = []
+            while rnd.random() > probability:
+                thread.append(ReviewComment(review_id=review.id, user_id=rnd.choice(self.user_ids),
+                                            body=rnd.choice(self.sentences)))
+            threads.append(thread)
+        comments = [comment for thread in threads for comment in thread]
+        if comments:
+            # About a half of the comments are replies to an earlier comment of the thread.
+            for comment, comment_id in zip(comments, allocate_ids(ReviewComment, len(comments))):
+                comment.id = comment_id
+            for thread in threads:
+                for index, comment in enumerate(thread):
+                    comment.parent = rnd.choice(thread[:index]) if index and rnd.random() < 0.5 else None
+                    comment.build_path()
+            review_date = f'(SELECT date_added FROM {BookReview._meta.db_table} WHERE id = review_id)'
+            self.spread_dates(ReviewComment, self.insert(ReviewComment, comments), review_date)
@@ -0,0 +1,84 @@
+import re
+from itertools import groupby
+from operator import attrgetter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from books.cache import bump_thread_version
+from books.models import BookReview, ReviewComment
+
+# What remains of '<q>{parent body}</q><br/>' after the quote, see the old CommentReviewCreateView.get_initial
+LEADING_BREAKS = re.compile(r'^(\s*<br\s*/?>)*\s*')
+
+
+def split_quote(body, bodies):
+    """
+    (parent id, own text) of an old style reply '<q>{parent body}</q><br/>{text}', or None.
+    The parent body may contain quotes itself, so every '</q>' is tried, the longest known body wins.
+    """
+    if not body.startswith('<q>'):
+        return None
+    end = len(body)
+    while True:
+        end = body.rfind('</q>', 0, end)
+        if end < 3:
+            return None
+        parent_id = bodies.get(body[3:end])
+        if parent_id is not None:
+            return parent_id, LEADING_BREAKS.sub('', body[end + 4:])
+
+
+class Command(BaseCommand):
+    help = ('Set ReviewComment.path of existing comments and turn replies which quote the parent comment '
+            '(<q>...</q>) into real replies with the quote removed from the body.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Reviews per transaction.')
+
+    def handle(self, *args, **options):
+        last_id, converted, threaded = 0, 0, 0
+        while True:
+            review_ids = list(
+                ReviewComment.objects.filter(path='', review_id__gt=last_id).order_by('review_id')
+                .values_list('review_id', flat=True).distinct()[:options['batch_size']]
+            )
+            if not review_ids:
+                break
+            last_id = review_ids[-1]
+            with transaction.atomic():
+                comments = list(ReviewComment.objects.filter(review__in=review_ids).order_by('review_id', 'id')
+                                .only('id', 'review_id', 'parent_id', 'body', 'path'))
+                for review_id, thread in groupby(comments, key=attrgetter('review_id')):
+                    converted += self.thread_review(list(thread))
+                ReviewComment.objects.bulk_update(comments, ['parent', 'body', 'path'], batch_size=1000)
+                threaded += len(comments)
+                book_ids = set(BookReview.objects.filter(id__in=review_ids).values_list('book_id', flat=True))
+                transaction.on_commit(lambda book_ids=book_ids: self.invalidate(book_ids))
+            self.stdout.write(f'Threaded {threaded} comments, {converted} quoted replies converted')
+
+    def thread_review(self, comments):
+        """ Set parents and paths of one review's comments (ordered by id, parents come first). """
+        by_id = {comment.id: comment for comment in comments}
+        bodies = {}  # original body -> id of the latest comment with it
+        converted = 0
+        for comment in comments:
+            original_body = comment.body
+            if not comment.path and comment.parent_id is None:
+                quote = split_quote(comment.body, bodies)
+                if quote is not None:
+                    comment.parent_id, comment.body = quote
+                    converted += 1
+            bodies[original_body] = comment.id
+            parent = by_id.get(comment.parent_id)
+            # A reply saved before its parent got a path has a top level path, it and its replies are redone.
+            if not comment.path or parent is not None and not comment.path.startswith(parent.path):
+                comment.parent = parent
+                comment.path = ''
+                comment.build_path()
+        return converted
+
+    def invalidate(self, book_ids):
+        """ Cached review threads of the books show the old quotes. """
+        for book_id in book_ids:
+            bump_thread_version(book_id)
@@ -1,33 +1,97 @@
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db import models
+from django.db import connections, models, router
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Concat, Length
 from django.urls import reverse
 
 from users.models import User
 from authors.models import Author
 
 
+def authors_display_subquery():
+    """ Comma separated names of the book authors in the order they were added, '' if there are none. """
+    return Coalesce(Subquery(
+        Book.authors.through.objects.filter(book=OuterRef('pk')).order_by().values('book').annotate(
+            names=StringAgg(Concat('author__first_name', Value(' '), 'author__last_name'),
+                            delimiter=', ', ordering='id')
+        ).values('names')
+    ), Value(''))
+
+
+class BookQuerySet(models.QuerySet):
+    def visible(self):
+        """ Books without a pending background deletion (see BookDeleteView). """
+        return self.filter(deleting=False)
+
+    def update_authors_display(self, **values):
+        """ Recompute authors_display of the books with one UPDATE, values are set by it too. """
+        return self.update(authors_display=authors_display_subquery(), **values)
+
+
 # Create your models here.
 class Book(models.Model):
     isbn13 = models.CharField(max_length=13, blank=True, unique=True, null=True)
     title = models.CharField(max_length=150)
     description = models.TextField(max_length=2000, null=True)
     authors = models.ManyToManyField(Author, related_name='books')
+    # Names of the authors in the order they were added, kept in sync by books.signals, so str(book) is query free.
+    authors_display = models.TextField(default='', editable=False)
     popularity_rank = models.PositiveSmallIntegerField(default=1,
                                                        validators=[MinValueValidator(1), MaxValueValidator(10)])
+    search_vector = SearchVectorField(null=True, editable=False)
+    reviews_count = models.PositiveIntegerField(default=0, editable=False)
+    # Decayed activity score, see books.popularity. Orders the catalog, popularity_rank only boosts search results.
+    popularity = models.FloatField(default=0, editable=False)
+    # Set when the book is queued for deletion by books.tasks.delete_book, such books are hidden.
+    deleting = models.BooleanField(default=False, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = BookQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='book_search_vector_idx'),
+            models.Index(fields=['-popularity', 'id'], name='book_popularity_score_idx'),
+        ]
 
     def __str__(self):
         """ Example:  '101 Reasons to Shop by Joseph Papa, Jessica Waldorf' """
-        return f'{self.title} by {", ".join(author.__str__() for author in self.authors.all())}'
+        return f'{self.title} by {self.authors_display}' if self.authors_display else self.title
 
     def get_absolute_url(self):
         return reverse('books:detail-book', kwargs={'pk': self.id})
 
 
+class BookDailyViews(models.Model):
+    """ Detail page views of a book per day, the view part of popularity recomputation. """
+    book = models.ForeignKey(Book, related_name='daily_views', on_delete=models.CASCADE)
+    day = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'day'], name='book_daily_views_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.book_id} {self.day}: {self.views}'
+
+
 class BookReview(models.Model):
     body = models.TextField(max_length=1000)
     book = models.ForeignKey(Book, related_name='reviews', on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     date_added = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['book', 'date_added', 'id'], name='review_book_date_idx'),
+        ]
 
     def __str__(self):
         return self.body
@@ -36,15 +100,63 @@ class BookReview(models.Model):
         return reverse('books:detail-book', kwargs={'pk': self.book.id})
 
 
+class ReviewCommentQuerySet(models.QuerySet):
+    def thread(self):
+        """ Depth first: every comment is followed by its replies. depth is 0 for comments on the review itself. """
+        return self.order_by('review_id', 'path').annotate(depth=Length('path') / ReviewComment.PATH_STEP - 1)
+
+
 class ReviewComment(models.Model):
+    PATH_STEP = 10  # digits of one id in path
+    MAX_DEPTH = 10  # a reply to a comment this deep becomes its sibling
+
     body = models.TextField(max_length=1000)
     review = models.ForeignKey(BookReview, related_name='comments', on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+    parent = models.ForeignKey('self', related_name='replies', null=True, blank=True, on_delete=models.CASCADE)
+    # Zero padded ids of the ancestors and of the comment itself, '0000000007' + '0000000012' for a reply.
+    path = models.CharField(max_length=PATH_STEP * MAX_DEPTH, default='', editable=False)
     date_added = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ReviewCommentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['review', 'path'], name='comment_review_path_idx'),
+        ]
 
     def __str__(self):
         return self.body
 
+    def build_path(self, using=None):
+        """
+        Set path of a new comment. The id is a part of it, so it is taken from the sequence before the insert.
+        A parent without a path (not backfilled by thread_comments yet) gets its path saved first.
+        """
+        using = using or router.db_for_write(ReviewComment)
+        if self.id is None:
+            with connections[using].cursor() as cursor:
+                cursor.execute('SELECT nextval(pg_get_serial_sequence(%s, %s))',
+                               [self._meta.db_table, self._meta.pk.column])
+                self.id = cursor.fetchone()[0]
+        if self.parent_id and not self.parent.path:
+            self.parent.build_path(using)
+            ReviewComment.objects.using(using).filter(id=self.parent_id, path='').update(path=self.parent.path)
+        parent_path = self.parent.path if self.parent_id else ''
+        if len(parent_path) >= self.PATH_STEP * self.MAX_DEPTH:
+            parent_path = parent_path[:-self.PATH_STEP]
+            self.parent_id = int(parent_path[-self.PATH_STEP:])
+        self.path = f'{parent_path}{self.id:0{self.PATH_STEP}d}'
+
+    def save(self, *args, **kwargs):
+        if not self.path:
+            self.build_path(kwargs.get('using'))
+            if self._state.adding:
+                # The id is set already, skip the UPDATE which Django tries first for objects with an id.
+                kwargs['force_insert'] = True
+        super(ReviewComment, self).save(*args, **kwargs)
+
     def get_absolute_url(self):
         return reverse('books:detail-book', kwargs={'pk': self.review.book.id})
 
@@ -0,0 +1,170 @@
+"""
+Book popularity: reviews, comments and page views weighted by 2 ** -(age / HALF_LIFE_DAYS).
+
+Decayed scores of all books shrink by the same factor over time, so Book.popularity stores
+ln(sum(weight * exp(rate * (t - EPOCH)))) instead: it orders books like the decayed score at any moment,
+a new event changes only its own book, and the logarithm keeps the exponents far from overflow.
+0 means no activity.
+"""
+import datetime
+import logging
+import math
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Abs, Exp, Greatest, Ln
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_views = Counter()
+_views_lock = threading.Lock()
+_views_flushed_at = time.monotonic()
+
+
+def decay_rate():
+    """ Decay rate per second. """
+    return math.log(2) / (settings.POPULARITY['HALF_LIFE_DAYS'] * 24 * 60 * 60)
+
+
+def epoch():
+    return datetime.datetime.fromisoformat(settings.POPULARITY['EPOCH']).replace(tzinfo=datetime.timezone.utc)
+
+
+def activity_score(weight, at=None):
+    """ ln(weight * exp(rate * (at - EPOCH))): the stored score of a single event. """
+    at = at or timezone.now()
+    return math.log(weight) + decay_rate() * (at - epoch()).total_seconds()
+
+
+def add_activity(weight, at=None):
+    """
+    Update expression adding an event to Book.popularity: ln(exp(popularity) + exp(score)),
+    computed as max + ln(1 + exp(-|difference|)) so it never overflows.
+    """
+    score = Value(activity_score(weight, at))
+    return Case(
+        When(popularity=0, then=score),
+        default=Greatest(F('popularity'), score) + Ln(Value(1.0) + Exp(-Abs(F('popularity') - score))),
+    )
+
+
+def record_view(book_id):
+    """
+    Count a book page view. Views are buffered per process and written by flush_views() at most every
+    VIEW_FLUSH_INTERVAL seconds, so a page view does not write to the database. A failed flush does not fail
+    the page, its views stay in the buffer for the next one.
+    """
+    global _views_flushed_at
+    with _views_lock:
+        _views[book_id] += 1
+        if time.monotonic() - _views_flushed_at < settings.POPULARITY['VIEW_FLUSH_INTERVAL']:
+            return
+        views = dict(_views)
+        _views.clear()
+        _views_flushed_at = time.monotonic()
+    try:
+        flush_views(views)
+    except DatabaseError:
+        logger.exception('Failed to flush %s book views, retrying with the next flush', sum(views.values()))
+        with _views_lock:
+            _views.update(views)
+
+
+def flush_views(views):
+    """ Add {book id: views} to the scores and to the daily view counts used by recompute(). """
+    if not views:
+        return
+    from .models import Book, BookDailyViews
+
+    now = timezone.now()
+    weight = settings.POPULARITY['WEIGHTS']['view']
+    rows = [(book_id, count, activity_score(weight * count, now)) for book_id, count in sorted(views.items())]
+    values = ', '.join(['(%s, %s, %s)'] * len(rows))
+    params = [value for row in rows for value in row]
+    book_table, views_table = Book._meta.db_table, BookDailyViews._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Rows are locked in id order, so concurrent flushes of other processes wait instead of deadlocking.
+        cursor.execute(f'SELECT id FROM {book_table} WHERE id = ANY(%s) ORDER BY id FOR UPDATE', [sorted(views)])
+        cursor.execute(
+            f'UPDATE {book_table} SET popularity = CASE WHEN popularity = 0 THEN v.score '
+            f'ELSE GREATEST(popularity, v.score) + LN(1 + EXP(-ABS(popularity - v.score))) END '
+            f'FROM (VALUES {values}) AS v (book_id, views, score) WHERE {book_table}.id = v.book_id',
+            params
+        )
+        # Deleted books are skipped by the join instead of failing the foreign key.
+        cursor.execute(
+            f'INSERT INTO {views_table} (book_id, day, views) '
+            f'SELECT v.book_id, %s, v.views FROM (VALUES {values}) AS v (book_id, views, score) '
+            f'JOIN {book_table} ON {book_table}.id = v.book_id '
+            f'ON CONFLICT (book_id, day) DO UPDATE SET views = {views_table}.views + EXCLUDED.views',
+            [now.date(), *params]
+        )
+
+
+def recompute(first_id, last_id, now=None):
+    """
+    Recompute popularity of books first_id..last_id from the activity of the last WINDOW_DAYS with one UPDATE.
+    Fixes what incremental updates miss: deleted reviews and comments and changed weights.
+    Views of buffers which were never flushed (a process exited) are lost, they are not in BookDailyViews.
+    Returns the number of changed books.
+    """
+    from .models import Book, BookDailyViews, BookReview, ReviewComment
+
+    now = now or timezone.now()
+    weights = settings.POPULARITY['WEIGHTS']
+    rate = decay_rate()
+    since = now - datetime.timedelta(days=settings.POPULARITY['WINDOW_DAYS'])
+    book_table = Book._meta.db_table
+    # Exponents are taken relative to now (<= 0, no overflow) and shifted back by rate * (now - EPOCH) outside.
+    sql = f'''
+        WITH events AS (
+            SELECT book_id, %(review)s AS weight, date_added AS at
+            FROM {BookReview._meta.db_table}
+            WHERE book_id BETWEEN %(first)s AND %(last)s AND date_added >= %(since)s
+            UNION ALL
+            SELECT review.book_id, %(comment)s, comment.date_added
+            FROM {ReviewComment._meta.db_table} comment
+            JOIN {BookReview._meta.db_table} review ON review.id = comment.review_id
+            WHERE review.book_id BETWEEN %(first)s AND %(last)s AND comment.date_added >= %(since)s
+            UNION ALL
+            SELECT book_id, %(view)s * views, day::timestamptz
+            FROM {BookDailyViews._meta.db_table}
+            WHERE book_id BETWEEN %(first)s AND %(last)s AND day >= %(since)s::date
+        ), scores AS (
+            SELECT book.id AS book_id, COALESCE(
+                LN(NULLIF(SUM(weight * EXP(%(rate)s * EXTRACT(EPOCH FROM at - %(now)s))), 0)) + %(shift)s, 0
+            ) AS score
+            FROM {book_table} book LEFT JOIN events ON events.book_id = book.id
+            WHERE book.id BETWEEN %(first)s AND %(last)s
+            GROUP BY book.id
+        )
+        UPDATE {book_table} SET popularity = scores.score
+        FROM scores
+        -- The score of a book does not change with time, only rows which are really off are written.
+        WHERE {book_table}.id = scores.book_id AND ABS({book_table}.popularity - scores.score) > 1e-9
+    '''
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {
+            'review': weights['review'], 'comment': weights['comment'], 'view': weights['view'],
+            'first': first_id, 'last': last_id, 'since': since, 'now': now, 'rate': rate,
+            'shift': rate * (now - epoch()).total_seconds(),
+        })
+        return cursor.rowcount
+
+
+def recompute_all(batch_size=5000):
+    """ recompute() all books in id ranges of batch_size, one short transaction each. Returns changed books. """
+    from .models import Book
+
+    last_id, changed = 0, 0
+    while True:
+        ids = list(Book.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return changed
+        changed += recompute(ids[0], ids[-1])
+        last_id = ids[-1]
@@ -0,0 +1,82 @@
+import re
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db.models import Case, ExpressionWrapper, F, FloatField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Concat
+
+from authors.models import Author
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+PHRASE_RE = re.compile(r'"([^"]*)"')
+ISBN_RE = re.compile(r'^[\d-]{10,17}$')
+ISBN_MATCH_RANK = 1.0e9  # far above any text rank
+
+
+def _authors_names_subquery():
+    """ Return a subquery with space separated names of all book authors. """
+    return Subquery(
+        Author.objects.filter(books=OuterRef('pk')).order_by().values('books').annotate(
+            names=StringAgg(Concat('first_name', Value(' '), 'last_name'), delimiter=' ')
+        ).values('names')[:1]
+    )
+
+
+def build_search_vector():
+    """ Weighted search vector: title (A), author names (B), description (C). """
+    config = settings.BOOK_SEARCH_CONFIG
+    return (SearchVector('title', weight='A', config=config) +
+            SearchVector(_authors_names_subquery(), weight='B', config=config) +
+            SearchVector('description', weight='C', config=config))
+
+
+def update_search_vector(book_ids):
+    """ Recompute search_vector for the given book ids with a single UPDATE. """
+    from .models import Book
+
+    book_ids = [book_id for book_id in book_ids if book_id is not None]
+    if not book_ids:
+        return 0
+    return Book.objects.filter(id__in=book_ids).update(search_vector=build_search_vector())
+
+
+def parse_search_query(query):
+    """
+    Convert user input into a raw tsquery string.
+    '"war and peace" tols' -> '(war <-> and <-> peace) & tols:*'
+    Quoted parts are matched as phrases, other words are matched by prefix.
+    """
+    terms = []
+    for phrase in PHRASE_RE.findall(query):
+        words = WORD_RE.findall(phrase)
+        if words:
+            terms.append(f'({" <-> ".join(words)})')
+    for word in WORD_RE.findall(PHRASE_RE.sub(' ', query)):
+        terms.append(f'{word}:*')
+    return ' & '.join(terms)
+
+
+def search_books(queryset, query):
+    """
+    Filter queryset by full-text query and order it by relevance mixed with popularity_rank.
+    Exact isbn13 matches are always included.
+    """
+    query = query.strip()
+    isbn_lookup = Q(isbn13=query.replace('-', '')) if ISBN_RE.match(query) else Q(pk__in=[])
+    raw_query = parse_search_query(query)
+    if not raw_query:
+        return queryset.filter(isbn_lookup)
+
+    search_query = SearchQuery(raw_query, search_type='raw', config=settings.BOOK_SEARCH_CONFIG)
+    rank = Coalesce(SearchRank(F('search_vector'), search_query), Value(0.0), output_field=FloatField())
+    if ISBN_RE.match(query):
+        # An exact isbn13 hit may not match the text at all, it goes before every text hit anyway.
+        rank = Case(When(isbn_lookup, then=Value(ISBN_MATCH_RANK)), default=rank, output_field=FloatField())
+    return queryset.filter(Q(search_vector=search_query) | isbn_lookup).annotate(
+        rank=rank
+    ).annotate(
+        score=ExpressionWrapper(
+            F('rank') * (Value(1.0) + Value(settings.BOOK_SEARCH_POPULARITY_WEIGHT) * F('popularity_rank')),
+            output_field=FloatField())
+    ).order_by('-score', '-popularity', 'id')
@@ -0,0 +1,196 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest, Now
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from authors.models import Author
+from authors.tasks import refresh_author_books
+from users.models import User
+
+from .cache import bump_thread_version
+from .models import Book, BookReview, ReviewComment
+from .popularity import add_activity
+from .search import update_search_vector
+from .tasks import refresh_user_books
+
+
+@receiver(post_save, sender=Book)
+def book_saved(sender, instance, update_fields=None, **kwargs):
+    """ Keep the search vector in sync with title and description. """
+    if update_fields and not {'title', 'description'} & set(update_fields):
+        return
+    update_search_vector([instance.id])
+
+
+@receiver(m2m_changed, sender=Book.authors.through)
+def book_authors_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """ Author names are a part of the book search vector. """
+    if action == 'pre_clear':
+        # pk_set is None for clear(), so remember affected books before they are unlinked.
+        instance._cleared_book_ids = list(instance.books.values_list('id', flat=True)) if reverse else [instance.id]
+    elif action == 'post_clear':
+        update_search_vector(getattr(instance, '_cleared_book_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        update_search_vector(pk_set if reverse else [instance.id])
+
+
+@receiver(pre_save, sender=Author)
+def author_pre_save(sender, instance, update_fields=None, **kwargs):
+    """ Remember old author name to detect renames in post_save, unless a save cannot change the name. """
+    if update_fields is not None and not {'first_name', 'last_name'} & set(update_fields):
+        return
+    if instance.id:
+        instance._old_name = Author.objects.filter(id=instance.id).values_list('first_name', 'last_name').first()
+
+
+@receiver(post_save, sender=Author)
+def author_saved(sender, instance, created, **kwargs):
+    """ Reindex books of a renamed author in the background, their pages and authors_display show the name too. """
+    # Not recorded by author_pre_save: the save did not touch the name.
+    old_name = instance.__dict__.pop('_old_name', (instance.first_name, instance.last_name))
+    if created or old_name == (instance.first_name, instance.last_name):
+        return
+    refresh_author_books.enqueue(author_id=instance.id)
+
+
+# <-------   Denormalized counters ------>
+def _shift_counter(queryset, field, delta, touch=False, **values):
+    """ Atomically add delta to a counter column, never going below zero. touch also sets updated_at. """
+    values[field] = Greatest(F(field) + delta, Value(0))
+    if touch:
+        values['updated_at'] = Now()
+    queryset.update(**values)
+
+
+@receiver(m2m_changed, sender=Book.authors.through)
+def update_authors_books_count(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keep Author.books_count and Book.authors_display in sync with Book.authors.
+    Changed books and authors are touched.
+    """
+    if action == 'pre_clear':
+        if reverse:
+            instance._cleared_book_ids = list(instance.books.values_list('id', flat=True))
+        else:
+            instance._cleared_author_ids = list(instance.authors.values_list('id', flat=True))
+        return
+    if action == 'pre_remove':
+        # pk_set has the ids passed to remove(), only the linked ones are counted.
+        links = Book.authors.through.objects
+        if reverse:
+            linked = links.filter(author_id=instance.pk, book_id__in=pk_set).values_list('book_id', flat=True)
+        else:
+            linked = links.filter(book_id=instance.pk, author_id__in=pk_set).values_list('author_id', flat=True)
+        instance._removed_ids = set(linked)
+        return
+    if action == 'post_clear':
+        if reverse:
+            _shift_counter(Author.objects.filter(id=instance.id), 'books_count', -len(instance._cleared_book_ids),
+                           touch=True)
+            Book.objects.filter(id__in=instance._cleared_book_ids).update_authors_display(updated_at=Now())
+        else:
+            _shift_counter(Author.objects.filter(id__in=instance._cleared_author_ids), 'books_count', -1, touch=True)
+            Book.objects.filter(id=instance.id).update_authors_display(updated_at=Now())
+        return
+    if action == 'post_remove':
+        pk_set = instance.__dict__.pop('_removed_ids', pk_set)
+    if action not in ('post_add', 'post_remove') or not pk_set:
+        return
+
+    delta = 1 if action == 'post_add' else -1
+    if reverse:
+        _shift_counter(Author.objects.filter(id=instance.id), 'books_count', delta * len(pk_set), touch=True)
+        Book.objects.filter(id__in=pk_set).update_authors_display(updated_at=Now())
+    else:
+        _shift_counter(Author.objects.filter(id__in=pk_set), 'books_count', delta, touch=True)
+        Book.objects.filter(id=instance.id).update_authors_display(updated_at=Now())
+
+
+@receiver(pre_delete, sender=Author)
+def author_pre_delete(sender, instance, **kwargs):
+    """ Through rows are deleted by cascade without m2m_changed, remember the books to update in post_delete. """
+    instance._deleted_book_ids = list(Book.objects.filter(authors=instance).values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Author)
+def author_deleted(sender, instance, **kwargs):
+    book_ids = getattr(instance, '_deleted_book_ids', [])
+    Book.objects.filter(id__in=book_ids).update_authors_display(updated_at=Now())
+    update_search_vector(book_ids)
+
+
+@receiver(pre_delete, sender=Book)
+def book_pre_delete(sender, instance, **kwargs):
+    """ Through rows are deleted by cascade without m2m_changed, so decrement authors counters here. """
+    _shift_counter(Author.objects.filter(books=instance), 'books_count', -1, touch=True)
+
+
+@receiver(post_save, sender=BookReview)
+def review_created(sender, instance, created, **kwargs):
+    """
+    Count a new review and add it to the book popularity, any change of a review changes the book page
+    (see Book.updated_at). Deleted reviews stay in popularity until recompute_popularity.
+    """
+    if created:
+        _shift_counter(Book.objects.filter(id=instance.book_id), 'reviews_count', 1, touch=True,
+                       popularity=add_activity(settings.POPULARITY['WEIGHTS']['review'], instance.date_added))
+        _shift_counter(User.objects.filter(id=instance.user_id), 'reviews_count', 1)
+    else:
+        Book.objects.filter(id=instance.book_id).update(updated_at=Now())
+
+
+@receiver(post_delete, sender=BookReview)
+def review_deleted(sender, instance, **kwargs):
+    _shift_counter(Book.objects.filter(id=instance.book_id), 'reviews_count', -1, touch=True)
+    _shift_counter(User.objects.filter(id=instance.user_id), 'reviews_count', -1)
+
+
+@receiver(post_save, sender=ReviewComment)
+def comment_created(sender, instance, created, **kwargs):
+    """ Count a new comment and add it to the book popularity, any change of a comment touches its review and book. """
+    book = Book.objects.filter(reviews=instance.review_id)
+    if created:
+        _shift_counter(BookReview.objects.filter(id=instance.review_id), 'comments_count', 1, touch=True)
+        book.update(updated_at=Now(),
+                    popularity=add_activity(settings.POPULARITY['WEIGHTS']['comment'], instance.date_added))
+    else:
+        BookReview.objects.filter(id=instance.review_id).update(updated_at=Now())
+        book.update(updated_at=Now())
+
+
+@receiver(post_delete, sender=ReviewComment)
+def comment_deleted(sender, instance, **kwargs):
+    _shift_counter(BookReview.objects.filter(id=instance.review_id), 'comments_count', -1, touch=True)
+    Book.objects.filter(reviews=instance.review_id).update(updated_at=Now())
+
+
+# <-------   Review thread cache invalidation ------>
+@receiver([post_save, post_delete], sender=BookReview)
+def review_changed(sender, instance, **kwargs):
+    book_id = instance.book_id
+    transaction.on_commit(lambda: bump_thread_version(book_id))
+
+
+@receiver([post_save, post_delete], sender=ReviewComment)
+def comment_changed(sender, instance, **kwargs):
+    book_id = BookReview.objects.filter(id=instance.review_id).values_list('book_id', flat=True).first()
+    if book_id is not None:
+        transaction.on_commit(lambda: bump_thread_version(book_id))
+
+
+@receiver(pre_save, sender=User)
+def user_pre_save(sender, instance, update_fields=None, **kwargs):
+    """ Remember old username to detect renames in post_save. """
+    if instance.id and (update_fields is None or 'username' in update_fields):
+        instance._old_username = User.objects.filter(id=instance.id).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def username_changed(sender, instance, created, **kwargs):
+    """ Cached threads show usernames of reviews and comments, refresh them in the background. """
+    old_username = instance.__dict__.pop('_old_username', instance.username)
+    if created or old_username == instance.username:
+        return
+    refresh_user_books.enqueue(user_id=instance.id)
@@ -0,0 +1,41 @@
+from django.db import transaction
+from django.db.models.functions import Now
+
+from jobs.queue import LOW, task
+
+from .cache import bump_thread_version
+from .models import Book, BookReview
+from .popularity import recompute_all
+
+DELETE_BATCH_SIZE = 500
+
+
+@task()
+def delete_book(book_id):
+    """
+    Delete a book with many reviews in short transactions: reviews and their comments go in batches
+    (every one updates counters by signals), then the book itself. A second run or a deleted book is harmless.
+    """
+    while True:
+        with transaction.atomic():
+            batch = list(BookReview.objects.filter(book=book_id).values_list('id', flat=True)[:DELETE_BATCH_SIZE])
+            if not batch:
+                break
+            BookReview.objects.filter(id__in=batch).delete()
+    Book.objects.filter(id=book_id).delete()
+
+
+@task(priority=LOW, timeout=60 * 60)
+def recompute_popularity(batch_size=5000):
+    """ Periodic correction of the incrementally updated popularity, see books.popularity.recompute(). """
+    recompute_all(batch_size)
+
+
+@task()
+def refresh_user_books(user_id):
+    """ After a username change: review threads of the user's books show the name, touch them and drop the cache. """
+    book_ids = set(BookReview.objects.filter(user=user_id).values_list('book_id', flat=True))
+    book_ids |= set(BookReview.objects.filter(comments__user=user_id).values_list('book_id', flat=True))
+    Book.objects.filter(id__in=book_ids).update(updated_at=Now())
+    for book_id in book_ids:
+        bump_thread_version(book_id)
@@ -1,3 +1,255 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from authors.models import Author
+from books.models import Book, BookReview, ReviewComment
+from config.nplusone import NPlusOneError, NPlusOneMiddleware
+from jobs.models import Job
+from users.models import User
+
+
+class BookViewsQueriesTest(TestCase):
+    """ The test runner checks views in strict N+1 mode, pages with many related rows must not repeat queries. """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(username=f'reader{number}', email=f'reader{number}@example.com',
+                                              password='password') for number in range(6)]
+        cls.authors = [Author.objects.create(first_name=f'Ann{number}', last_name=f'Writer{number}')
+                       for number in range(6)]
+        cls.books = []
+        for number in range(8):
+            book = Book.objects.create(title=f'Galaxy travels {number}', description='Stars and planets.')
+            book.authors.add(*cls.authors[number % 3:number % 3 + 3])
+            cls.books.append(book)
+        book = cls.books[0]
+        for number, user in enumerate(cls.users):
+            review = BookReview.objects.create(book=book, user=user, body=f'Review {number}')
+            parent = None
+            for reply in range(3):
+                parent = ReviewComment.objects.create(review=review, user=cls.users[reply], body='Comment',
+                                                      parent=parent)
+
+    def setUp(self):
+        self.client.defaults['REMOTE_ADDR'] = '10.0.0.1'
+        self.client.force_login(self.users[0])
+
+    def test_list(self):
+        response = self.client.get(reverse('books:list-book'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['books']), 8)
+
+    def test_search(self):
+        response = self.client.get(reverse('books:search-books'), {'book-search': 'galaxy'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['books']), 8)
+
+    def test_detail(self):
+        response = self.client.get(reverse('books:detail-book', kwargs={'pk': self.books[0].id}))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Review 5')
+
+    def test_list_not_modified(self):
+        etag = self.client.get(reverse('books:list-book'))['ETag']
+        self.assertEqual(self.client.get(reverse('books:list-book'), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_unprefetched_loop_raises(self):
+        """ The same loop without prefetch_related('authors') is an N+1 and fails a request in strict mode. """
+        def view(request):
+            return [list(book.authors.all()) for book in Book.objects.all()]
+
+        with self.assertRaises(NPlusOneError):
+            NPlusOneMiddleware(view)(RequestFactory().get('/books/'))
+
+
+class CommentPathTest(TestCase):
+    """ Replies to comments which were not backfilled by thread_comments yet. """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', email='reader@example.com', password='password')
+        book = Book.objects.create(title='Galaxy travels')
+        cls.review = BookReview.objects.create(book=book, user=cls.user, body='Review')
+
+    def old_comment(self, **kwargs):
+        comment = ReviewComment.objects.create(review=self.review, user=self.user, body='Comment', **kwargs)
+        ReviewComment.objects.filter(id=comment.id).update(path='')
+        comment.path = ''
+        return comment
+
+    def test_reply_to_parent_without_path(self):
+        parent = self.old_comment()
+        reply = ReviewComment.objects.create(review=self.review, user=self.user, body='Reply', parent=parent)
+        parent.refresh_from_db()
+        self.assertTrue(parent.path)
+        self.assertTrue(reply.path.startswith(parent.path))
+
+    def test_command_rethreads_misplaced_replies(self):
+        parent = self.old_comment()
+        reply = ReviewComment.objects.create(review=self.review, user=self.user, body='Reply', parent=parent)
+        nested = ReviewComment.objects.create(review=self.review, user=self.user, body='Nested', parent=reply)
+        # What the reply and its own reply looked like when they were saved before the parent got a path
+        ReviewComment.objects.filter(id=parent.id).update(path='')
+        ReviewComment.objects.filter(id=reply.id).update(path=f'{reply.id:0{ReviewComment.PATH_STEP}d}')
+        ReviewComment.objects.filter(id=nested.id).update(
+            path=f'{reply.id:0{ReviewComment.PATH_STEP}d}{nested.id:0{ReviewComment.PATH_STEP}d}')
+        call_command('thread_comments', stdout=StringIO())
+        parent.refresh_from_db()
+        reply.refresh_from_db()
+        nested.refresh_from_db()
+        self.assertTrue(reply.path.startswith(parent.path) and len(reply.path) > len(parent.path))
+        self.assertTrue(nested.path.startswith(reply.path) and len(nested.path) > len(reply.path))
+
+
+@override_settings(BOOK_DELETE_INLINE_MAX_REVIEWS=0)
+class BookBackgroundDeleteTest(TestCase):
+    """ A book with more reviews than BOOK_DELETE_INLINE_MAX_REVIEWS is hidden and deleted by a job. """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(username='admin', email='admin@example.com', password='password')
+        cls.book = Book.objects.create(title='Galaxy travels')
+        BookReview.objects.create(book=cls.book, user=cls.user, body='Review')
+
+    def setUp(self):
+        self.client.defaults['REMOTE_ADDR'] = '10.0.0.1'
+        self.client.force_login(self.user)
+
+    def test_hidden_and_queued_once(self):
+        url = reverse('books:delete-book', kwargs={'pk': self.book.id})
+        self.client.post(url)
+        self.client.post(url)
+        self.assertEqual(Job.objects.filter(name='books.delete_book').count(), 1)
+        self.assertEqual(self.client.get(reverse('books:detail-book', kwargs={'pk': self.book.id})).status_code, 404)
+        self.assertNotIn(self.book, self.client.get(reverse('books:list-book')).context['books'])
+
+    def test_not_editable(self):
+        self.client.post(reverse('books:delete-book', kwargs={'pk': self.book.id}))
+        self.assertEqual(self.client.get(reverse('books:edit-book', kwargs={'pk': self.book.id})).status_code, 404)
+        self.assertEqual(self.client.get(reverse('books:delete-book', kwargs={'pk': self.book.id})).status_code, 404)
+
+
+class AuthorsBooksCountTest(TestCase):
+    """ Author.books_count follows Book.authors changes, ids which were not linked do not count. """
+
+    def setUp(self):
+        self.author = Author.objects.create(first_name='Ann', last_name='Writer')
+        self.linked, self.other = Book.objects.create(title='Linked'), Book.objects.create(title='Other')
+        self.linked.authors.add(self.author)
+        Book.objects.create(title='Second').authors.add(self.author)
+
+    def books_count(self):
+        return Author.objects.get(id=self.author.id).books_count
+
+    def test_remove_not_linked_author(self):
+        self.other.authors.remove(self.author)
+        self.assertEqual(self.books_count(), 2)
+
+    def test_remove_not_linked_book(self):
+        self.author.books.remove(self.other, self.linked)
+        self.assertEqual(self.books_count(), 1)
+
+    def test_remove_linked_author(self):
+        self.linked.authors.remove(self.author)
+        self.assertEqual(self.books_count(), 1)
+
+
+class AuthorRenameTest(TestCase):
+    """ Books are reindexed when the author is renamed, saves of other fields do not read the old name. """
+
+    def setUp(self):
+        self.author = Author.objects.create(first_name='Ann', last_name='Writer')
+
+    def rename_jobs(self):
+        return Job.objects.filter(name='authors.refresh_author_books').count()
+
+    def test_update_fields_without_name(self):
+        self.author.description = 'Writes about stars.'
+        with self.assertNumQueries(1):
+            self.author.save(update_fields=['description'])
+        self.assertEqual(self.rename_jobs(), 0)
+
+    def test_rename(self):
+        self.author.last_name = 'Author'
+        self.author.save(update_fields=['last_name'])
+        self.assertEqual(self.rename_jobs(), 1)
+        self.author.save()
+        self.assertEqual(self.rename_jobs(), 1)
+
+
+class BookDetailConditionalTest(TestCase):
+    """ The book page depends on the user, its ETag changes with the user's role. """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', email='reader@example.com', password='password')
+        cls.book = Book.objects.create(title='Galaxy travels')
+
+    def setUp(self):
+        self.client.defaults['REMOTE_ADDR'] = '10.0.0.1'
+        self.client.force_login(self.user)
+
+    def get(self, **headers):
+        return self.client.get(reverse('books:detail-book', kwargs={'pk': self.book.id}), **headers)
+
+    def test_not_modified(self):
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=self.get()['ETag']).status_code, 304)
+
+    def test_group_change(self):
+        etag = self.get()['ETag']
+        self.user.groups.add(Group.objects.create(name='Authors'))
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_staff_change(self):
+        etag = self.get()['ETag']
+        User.objects.filter(id=self.user.id).update(is_staff=True)
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ImportCatalogTest(TestCase):
+    """ import_catalog skips malformed rows and resumes after the last committed batch. """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'catalog.jsonl')
+
+    def write(self, *lines):
+        with open(self.path, 'w') as file:
+            file.write('\n'.join(line if isinstance(line, str) else json.dumps(line) for line in lines))
+
+    def call(self, *args):
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_catalog', self.path, *args, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_malformed_rows_skipped(self):
+        self.write({'title': 'Galaxy travels', 'authors': ['Ann Writer']}, {'authors': ['Ann Writer']},
+                   {'title': 'Stars', 'popularity_rank': 'high'}, '{not json', {'title': 'Planets'})
+        stdout, stderr = self.call('--batch-size', '2')
+        self.assertEqual(sorted(Book.objects.values_list('title', flat=True)), ['Galaxy travels', 'Planets'])
+        self.assertIn('3 malformed rows skipped', stdout)
+        self.assertIn('Line 3 skipped: popularity_rank "high" is not a number', stderr)
+
+    def test_resume_committed_batch(self):
+        """ Books without isbn13 of a committed batch are not imported again. """
+        self.write({'title': 'First'}, {'title': 'Second'}, {'title': 'Third'})
+        first = Book.objects.create(title='First')
+        with open(f'{self.path}.checkpoint', 'w') as file:
+            json.dump({'line': 1, 'previous_line': 0, 'book_id': first.id}, file)
+        self.call('--resume')
+        self.assertEqual(sorted(Book.objects.values_list('title', flat=True)), ['First', 'Second', 'Third'])
+
+    def test_resume_rolled_back_batch(self):
+        self.write({'title': 'First'}, {'title': 'Second'})
+        with open(f'{self.path}.checkpoint', 'w') as file:
+            json.dump({'line': 2, 'previous_line': 0, 'book_id': 0}, file)
+        self.call('--resume')
+        self.assertEqual(sorted(Book.objects.values_list('title', flat=True)), ['First', 'Second'])
@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.db.models import prefetch_related_objects
+
+from config.pagination import encode_cursor, paginate_keyset
+
+from .models import BookReview, ReviewComment
+
+REVIEWS_ORDERING = ('date_added', 'id')
+COMMENTS_ORDERING = ('path',)
+
+
+def attach_comment_previews(reviews, limit):
+    """
+    Set review.comment_preview (the first limit comments of the thread) and review.comments_cursor
+    (None if there are no more) for all reviews with one query: a LATERAL join reads at most limit + 1
+    rows per review from the (review, path) index, however long the threads are.
+    """
+    reviews = list(reviews)
+    if not reviews:
+        return
+    table = ReviewComment._meta.db_table
+    comments = list(ReviewComment.objects.raw(
+        f'SELECT comment.*, length(comment.path) / %s - 1 AS depth '
+        f'FROM unnest(%s::bigint[]) AS review (id) CROSS JOIN LATERAL ('
+        f'  SELECT * FROM {table} WHERE review_id = review.id ORDER BY path LIMIT %s'
+        f') AS comment ORDER BY comment.review_id, comment.path',
+        [ReviewComment.PATH_STEP, [review.id for review in reviews], limit + 1]
+    ))
+    prefetch_related_objects(comments, 'user')
+
+    by_review = {}
+    for comment in comments:
+        by_review.setdefault(comment.review_id, []).append(comment)
+    for review in reviews:
+        thread = by_review.get(review.id, [])
+        review.comment_preview = thread[:limit]
+        review.comments_cursor = encode_cursor([thread[limit - 1].path]) if len(thread) > limit else None
+
+
+def reviews_page(book_id, cursor=None):
+    """ A KeysetPage of the book reviews, oldest first, with comment previews. Raises ValueError for a bad cursor. """
+    queryset = BookReview.objects.filter(book=book_id).select_related('user')
+    page = paginate_keyset(queryset, REVIEWS_ORDERING, cursor, settings.REVIEWS_PAGE_SIZE)
+    attach_comment_previews(page, settings.COMMENTS_PREVIEW_SIZE)
+    return page
+
+
+def comments_page(review_id, cursor=None):
+    """ A KeysetPage of the review comments in thread order, with depth. Raises ValueError for a bad cursor. """
+    queryset = ReviewComment.objects.filter(review=review_id).thread().select_related('user')
+    return paginate_keyset(queryset, COMMENTS_ORDERING, cursor, settings.COMMENTS_PAGE_SIZE)
@@ -10,6 +10,9 @@ urlpatterns = [
     path('create', views.BookCreateView.as_view(), name='create-book'),
     path('<int:pk>/delete', views.BookDeleteView.as_view(), name='delete-book'),
     path('search', views.BookListView.as_view(), name='search-books'),
+    path('<int:book_id>/reviews', views.BookReviewsFragmentView.as_view(), name='reviews-fragment'),
+    path('<int:book_id>/<int:review_id>/comments', views.ReviewCommentsFragmentView.as_view(),
+         name='comments-fragment'),
     path('<int:book_id>/review', views.BookReviewCreateView.as_view(), name='add-review'),
     path('<int:book_id>/review-edit/<int:pk>', views.BookReviewUpdateView.as_view(), name='edit-review'),
     path('<int:book_id>/review-delete/<int:pk>', views.BookReviewDeleteView.as_view(), name='delete-review'),
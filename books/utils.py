@@ -1,4 +1,7 @@
-from django.core.exceptions import PermissionDenied
+from django.core.exceptions import ObjectDoesNotExist, PermissionDenied
+from django.http import Http404
+
+from .models import Book
 
 
 class IsOwnerOrStaff:
@@ -10,3 +13,42 @@ class IsOwnerOrStaff:
         if self.request.user == obj.user or self.request.user.is_staff:
             return obj
         raise PermissionDenied('You don\'t have a permissions to do this.')
+
+
+def is_book_author(user, book):
+    """
+    Check that user is an author of the book. Uses prefetched book authors if they are loaded,
+    otherwise a single EXISTS query over Book.authors through table.
+    """
+    prefetched = getattr(book, '_prefetched_objects_cache', {})
+    if 'authors' in prefetched:
+        return any(author.user_id == user.pk for author in prefetched['authors'])
+    return book.authors.through.objects.filter(book_id=book.pk, author__user_id=user.pk).exists()
+
+
+def can_manage_book(user, book):
+    """ Return True if user is a staff or an author of the book. The answer is memoized for the request. """
+    if not user.is_authenticated:
+        return False
+    if user.is_staff:
+        return True
+    memo = user.__dict__.setdefault('_manageable_books', {})
+    if book.pk not in memo:
+        memo[book.pk] = is_book_author(user, book)
+    return memo[book.pk]
+
+
+class BookOwnerOrStaffMixin:
+    """
+    Return the book if user is a staff or is a book author.
+    """
+    book_permission_denied_message = 'You don\'t have permission to do this with the book.'
+
+    def get_object(self, queryset=None):
+        try:
+            book = Book.objects.visible().get(id=self.kwargs.get('pk'))
+        except ObjectDoesNotExist:
+            raise Http404('The book does not exist or has been deleted')
+        if can_manage_book(self.request.user, book):
+            return book
+        raise PermissionDenied(self.book_permission_denied_message)
@@ -1,33 +1,52 @@
 from django.shortcuts import get_object_or_404
-from django.http import Http404
+from django.conf import settings
+from django.contrib import messages
+from django.http import Http404, HttpResponse, HttpResponseRedirect
+from django.template.loader import render_to_string
 from django.urls import reverse
-from django.views.generic import CreateView, ListView, UpdateView, DetailView, DeleteView
-from django.db.models import Q
+from django.db import transaction
+from django.db.models.functions import Now
+from django.utils.decorators import method_decorator
+from django.views.generic import CreateView, ListView, UpdateView, DetailView, DeleteView, View
 from django.core.exceptions import PermissionDenied, ObjectDoesNotExist
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
 
 from authors.models import Author
+from config.conditional import conditional_content, conditional_detail
+from config.pagination import KeysetPaginationMixin
 
 from .models import Book, BookReview, ReviewComment
 from .forms import BookForm, ReviewCommentForm, BookReviewForm
-from .utils import IsOwnerOrStaff
+from .cache import owner_actions, render_reviews_page
+from .popularity import record_view
+from .search import search_books
+from .tasks import delete_book
+from .threads import comments_page
+from .utils import BookOwnerOrStaffMixin, IsOwnerOrStaff
 
 
 # <-------   Views for Book model ------>
-class BookListView(ListView):
+@method_decorator(conditional_content, name='dispatch')
+class BookListView(KeysetPaginationMixin, ListView):
     model = Book
     context_object_name = 'books'
     paginate_by = 10
+    keyset_ordering = ('-popularity', 'id')
+
+    def get_keyset_ordering(self):
+        """ Search results are ordered by relevance, so they use regular pagination. """
+        if self.request.GET.get('book-search'):
+            return None
+        return self.keyset_ordering
 
     def get_queryset(self):
         """ Return a queryset of all or filtered objects. """
         query = self.request.GET.get('book-search', None)
-        ordering = '-popularity_rank'
+        ordering = '-popularity'
         if query:
-            queryset = Book.objects.filter(
-                Q(title__icontains=query) | Q(isbn13=query)).prefetch_related('authors').order_by(ordering)
+            queryset = search_books(Book.objects.visible().prefetch_related('authors'), query)
         else:
-            queryset = Book.objects.prefetch_related('authors').order_by(ordering)
+            queryset = Book.objects.visible().prefetch_related('authors').order_by(ordering)
         return queryset
 
     def get_context_data(self, *args, **kwargs):
@@ -40,40 +59,65 @@ class BookListView(ListView):
 class BookDetailView(DetailView):
     context_object_name = 'book'
 
+    def get(self, request, *args, **kwargs):
+        """ Count the view for the popularity, 304 answers to a browser with the page cached are views too. """
+        response = self.get_page(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            record_view(kwargs['pk'])
+        return response
+
+    @conditional_detail(Book, per_user=True)
+    def get_page(self, request, *args, **kwargs):
+        return super(BookDetailView, self).get(request, *args, **kwargs)
+
     def get_object(self, queryset=None):
         try:
-            book = Book.objects.prefetch_related('authors').get(id=self.kwargs.get('pk'))
+            book = Book.objects.visible().prefetch_related('authors').get(id=self.kwargs.get('pk'))
         except ObjectDoesNotExist:
             raise Http404('The book does not exist or has been deleted')
         return book
 
     def get_context_data(self, **kwargs):
-        """ Add book reviews data to a context with a related review comments. """
+        """ Add the cached first page of reviews to a context, the rest is loaded by "More reviews" links. """
         context = super(BookDetailView, self).get_context_data(**kwargs)
-        context['reviews'] = BookReview.objects.filter(book=self.kwargs.get('pk')).select_related('user')\
-            .order_by('date_added').prefetch_related('comments', 'comments__user')
-        if self.request.user.is_authenticated:
-            author = Author.objects.filter(user=self.request.user).first()
-            context['is_author'] = (True if author and author in self.object.authors.all() else False)
+        context['reviews_thread'] = render_reviews_page(self.object.id, self.request)
         return context
 
 
-class BookUpdateView(PermissionRequiredMixin, UpdateView):
-    permission_required = 'books.change_book'
-    form_class = BookForm
-    context_object_name = 'book'
+class BookReviewsFragmentView(View):
+    """ Html of the next page of reviews for the "More reviews" link: '?cursor='. """
 
-    def get_object(self, queryset=None):
+    @conditional_detail(Book, per_user=True, pk_kwarg='book_id')
+    def get(self, request, book_id):
         try:
-            book = Book.objects.prefetch_related('authors').get(id=self.kwargs.get('pk'))
-        except ObjectDoesNotExist:
-            raise Http404('The book does not exist or has been deleted')
+            return HttpResponse(render_reviews_page(book_id, request, request.GET.get('cursor') or None))
+        except ValueError:
+            raise Http404('Invalid cursor.')
+
 
-        # Check that user is a staff or is a book author.
-        author = Author.objects.filter(user=self.request.user).first()
-        if self.request.user.is_staff or author and author in book.authors.all():
-            return book
-        raise PermissionDenied('You don\'t have permission to edit this book ')
+class ReviewCommentsFragmentView(View):
+    """ Html of the next comments of a review for the "More comments" link: '?cursor='. """
+
+    @conditional_detail(Book, per_user=True, pk_kwarg='book_id')
+    def get(self, request, book_id, review_id):
+        review = get_object_or_404(BookReview.objects.only('id', 'book_id'), id=review_id, book=book_id)
+        try:
+            page = comments_page(review.id, request.GET.get('cursor') or None)
+        except ValueError:
+            raise Http404('Invalid cursor.')
+        html = render_to_string('books/comments_list.html', {
+            'review': review,
+            'comments': page,
+            'next_cursor': page.next_cursor,
+        }, request=request)
+        return HttpResponse(owner_actions(html, request.user))
+
+
+class BookUpdateView(PermissionRequiredMixin, BookOwnerOrStaffMixin, UpdateView):
+    permission_required = 'books.change_book'
+    form_class = BookForm
+    context_object_name = 'book'
+    book_permission_denied_message = 'You don\'t have permission to edit this book '
 
 
 class BookCreateView(PermissionRequiredMixin, CreateView):
@@ -91,30 +135,29 @@ class BookCreateView(PermissionRequiredMixin, CreateView):
         return super(BookCreateView, self).form_valid(form)
 
 
-class BookDeleteView(PermissionRequiredMixin, DeleteView):
+class BookDeleteView(PermissionRequiredMixin, BookOwnerOrStaffMixin, DeleteView):
     permission_required = 'books.delete_book'
+    context_object_name = 'book'
+    book_permission_denied_message = 'You don\'t have permission to delete this book '
+
+    def delete(self, request, *args, **kwargs):
+        """
+        A book with many reviews is deleted by a background job, deleting all of them would block the request.
+        Until then the book is hidden, a repeated request does not queue another job.
+        """
+        book = self.get_object()
+        if book.reviews_count <= settings.BOOK_DELETE_INLINE_MAX_REVIEWS:
+            return super(BookDeleteView, self).delete(request, *args, **kwargs)
+        with transaction.atomic():
+            # updated_at changes ETag, so cached pages of the book are not answered with 304 either.
+            if Book.objects.filter(id=book.id, deleting=False).update(deleting=True, updated_at=Now()):
+                delete_book.enqueue(book_id=book.id)
+        messages.info(request, f'The book "{book.title}" will be deleted in a moment.')
+        return HttpResponseRedirect(self.get_success_url())
 
     def get_success_url(self):
         return reverse('books:list-book')
 
-    def get_context_data(self, **kwargs):
-        """ Add book data to context for using it in a template. """
-        context = super(BookDeleteView, self).get_context_data(**kwargs)
-        context['book'] = Book.objects.get(id=self.kwargs.get('pk'))
-        return context
-
-    def get_object(self, queryset=None):
-        try:
-            book = Book.objects.prefetch_related('authors').get(id=self.kwargs.get('pk'))
-        except ObjectDoesNotExist:
-            raise Http404('The book does not exist or has been deleted')
-
-        """ Check that user is a staff or is book author. """
-        author = Author.objects.filter(user=self.request.user).first()
-        if self.request.user.is_staff or author and author in book.authors.all():
-            return book
-        raise PermissionDenied('You don\'t have permission to delete this book ')
-
 
 # <-------   Views for BookReview model ------>
 class BookReviewCreateView(PermissionRequiredMixin, CreateView):
@@ -175,26 +218,28 @@ class CommentReviewCreateView(LoginRequiredMixin, CreateView):
     model = ReviewComment
     form_class = ReviewCommentForm
 
-    def get_initial(self):
-        """ Pre-populating form if it's a reply. """
-        initial = super(CommentReviewCreateView, self).get_initial()
-        if 'reply_id' in self.kwargs:
-            parent_comment = get_object_or_404(ReviewComment, id=self.kwargs.get('reply_id'))
-            initial['body'] = f'<q>{parent_comment.body}</q><br/>'
-        return initial
+    def get_parent_comment(self):
+        """ The comment which is replied to, it must belong to the same review. None for a comment on the review. """
+        if 'reply_id' not in self.kwargs:
+            return None
+        return get_object_or_404(ReviewComment.objects.select_related('user'), id=self.kwargs.get('reply_id'),
+                                 review=self.kwargs.get('review_id'))
 
     def form_valid(self, form):
-        """ Add current user and review instance to form data before saving. """
+        """ Add current user, review and parent comment to form data before saving. """
         try:
             form.instance.review = BookReview.objects.get(id=self.kwargs.get('review_id'))
         except ObjectDoesNotExist:
             raise Http404('The review does not exist or has been deleted.')
         form.instance.user = self.request.user
+        form.instance.parent = self.get_parent_comment()
         return super(CommentReviewCreateView, self).form_valid(form)
 
     def get_context_data(self, **kwargs):
+        """ A reply shows the comment it answers above the form instead of quoting it in the body. """
         context = super(CommentReviewCreateView, self).get_context_data(**kwargs)
         context['book_id'] = self.kwargs.get('book_id')
+        context['parent_comment'] = self.get_parent_comment()
         return context
 
 
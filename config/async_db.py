@@ -0,0 +1,21 @@
+import functools
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+
+def db_sync_to_async(func):
+    """
+    Run blocking ORM code from an async view in the thread pool, not in the single thread_sensitive thread,
+    so concurrent requests do not queue behind each other. Django 3.2 has no async ORM.
+    Connections of pool threads are closed like after a regular request (respecting CONN_MAX_AGE).
+    """
+    @functools.wraps(func)
+    def inner(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(inner, thread_sensitive=False)
@@ -0,0 +1,27 @@
+import time
+
+from django.core.cache import cache
+
+
+def get_version(key):
+    """
+    Current value of a version counter, a part of the cache keys it covers. A fresh version is time based,
+    so it never repeats an evicted one.
+    """
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_version(key):
+    """
+    Invalidate the entries keyed on the version. An entry computed from data read before the bump is stored
+    under the old version, so a fill racing with the invalidation does not bring stale data back.
+    """
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
@@ -0,0 +1,99 @@
+import hashlib
+from functools import wraps
+
+from django.contrib.messages import get_messages
+from django.utils.cache import get_conditional_response, patch_cache_control, set_response_etag
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from users.membership import membership_version
+
+
+def get_updated_at(model, request, pk):
+    """ updated_at of an object with a single indexed lookup, memoized per request for etag and last_modified. """
+    versions = request.__dict__.setdefault('_updated_at', {})
+    key = (model, pk)
+    if key not in versions:
+        versions[key] = model.objects.filter(pk=pk).values_list('updated_at', flat=True).first()
+    return versions[key]
+
+
+def conditional_object(model, per_user=False, pk_kwarg='pk', variant=None):
+    """
+    Decorator for a detail view function: answer If-None-Match / If-Modified-Since with 304
+    before the object is loaded and rendered. ETag is made from updated_at of the object.
+    per_user pages (html with user dependent links) get the user id, staff flags and membership version
+    in ETag and no Last-Modified; a page with pending messages is always rendered.
+    variant(request) returns what else selects the representation (query parameters), '' for the default one.
+    Its hash goes into ETag, and non-default representations get no Last-Modified.
+    """
+    def etag(request, *args, **kwargs):
+        updated_at = get_updated_at(model, request, kwargs[pk_kwarg])
+        if updated_at is None:
+            return None
+        tag = f'{model._meta.label_lower}:{kwargs[pk_kwarg]}:{updated_at.timestamp():.6f}'
+        if per_user:
+            if len(get_messages(request)):
+                return None
+            tag = f'{tag}:{request.user.pk}'
+            if request.user.is_authenticated:
+                # Edit links and the sidebar depend on the staff flags, groups and permissions of the user.
+                user = request.user
+                tag = f'{tag}:{user.is_staff:d}{user.is_superuser:d}:{membership_version(user.pk)}'
+        representation = variant(request) if variant else ''
+        if representation:
+            tag = f'{tag}:{hashlib.sha256(representation.encode("utf-8")).hexdigest()[:16]}'
+        return f'"{tag}"'
+
+    def last_modified(request, *args, **kwargs):
+        if per_user or variant and variant(request):
+            return None
+        return get_updated_at(model, request, kwargs[pk_kwarg])
+
+    def decorator(view):
+        conditional_view = condition(etag_func=etag, last_modified_func=last_modified)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            # Clients keep the response but revalidate it every time.
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+
+    return decorator
+
+
+def conditional_detail(model, per_user=False, pk_kwarg='pk', variant=None):
+    """ conditional_object for the get() of a class based detail view. """
+    return method_decorator(conditional_object(model, per_user, pk_kwarg, variant))
+
+
+
+
+def conditional_content_response(request, response):
+    """ ETag from a hash of the rendered response, 304 for a matching If-None-Match. See conditional_content. """
+    if request.method not in ('GET', 'HEAD') or response.status_code != 200 or response.streaming:
+        return response
+    if hasattr(response, 'render'):
+        response.render()
+    set_response_etag(response)
+    if response.has_header('ETag'):
+        response = get_conditional_response(request, etag=response['ETag'], response=response)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def conditional_content(view):
+    """
+    Decorator for list views: ETag is a hash of the rendered response and a matching If-None-Match gets 304.
+    Unlike conditional_object this saves the transfer, not the rendering: the catalog is reordered by popularity
+    updates which do not touch updated_at, so no cheap lookup tells whether a page changed.
+    Streamed responses and pages with pending messages are sent as they are.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if len(get_messages(request)):
+            return view(request, *args, **kwargs)
+        return conditional_content_response(request, view(request, *args, **kwargs))
+    return wrapper
@@ -0,0 +1,128 @@
+import contextvars
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# None outside of requests (management commands, shell): everything goes to the primary.
+_use_primary = contextvars.ContextVar('use_primary', default=None)
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith('replica')]
+
+
+class ReplicaHealth:
+    """
+    Healthy replicas, checked at most every REPLICA_HEALTH_CHECK_INTERVAL seconds per replica.
+    A replica is unhealthy if it does not answer or lags more than REPLICA_MAX_LAG seconds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = {}  # alias -> (checked_at, healthy)
+
+    def check(self, alias):
+        try:
+            with connections[alias].cursor() as cursor:
+                # The last replayed transaction gets older while the primary has no writes, a replica which
+                # replayed everything it received does not lag. NULL on a server which is not a replica.
+                cursor.execute(
+                    'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+                    'ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END'
+                )
+                lag = cursor.fetchone()[0]
+        except DatabaseError:
+            connections[alias].close()
+            return False
+        max_lag = getattr(settings, 'REPLICA_MAX_LAG', None)
+        return max_lag is None or lag is None or lag <= max_lag
+
+    def is_healthy(self, alias):
+        now = time.monotonic()
+        with self._lock:
+            checked_at, healthy = self._state.get(alias, (None, True))
+            stale = checked_at is None or now - checked_at >= settings.REPLICA_HEALTH_CHECK_INTERVAL
+            if stale:
+                # Other threads keep using the old state meanwhile instead of checking too.
+                self._state[alias] = (now, healthy)
+        if stale:
+            healthy = self.check(alias)
+            with self._lock:
+                self._state[alias] = (now, healthy)
+        return healthy
+
+    def mark_unhealthy(self, alias):
+        with self._lock:
+            self._state[alias] = (time.monotonic(), False)
+
+    def healthy_replicas(self):
+        return [alias for alias in replica_aliases() if self.is_healthy(alias)]
+
+
+replica_health = ReplicaHealth()
+
+
+def pin_to_primary():
+    """ Send the rest of the current request to the primary. """
+    if _use_primary.get() is not None:
+        _use_primary.set(True)
+
+
+class ReplicaRouter:
+    """
+    Reads of safe requests go to a random healthy replica, everything else goes to the primary:
+    writes, reads inside a transaction, reads after a write in the same request, requests of a client
+    pinned by ReplicaPinningMiddleware after its write, and anything outside of a request.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _use_primary.get() is not False or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        replicas = replica_health.healthy_replicas()
+        return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        pin_to_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaPinningMiddleware:
+    """
+    Read-your-writes: after an unsafe request (POST a review, edit a book...) the client is pinned
+    to the primary for REPLICA_STICKY_SECONDS with a cookie, so it never sees a replica which lags behind.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        unsafe = request.method not in SAFE_METHODS
+        pinned = unsafe or self.is_pinned(request)
+        token = _use_primary.set(pinned)
+        try:
+            response = self.get_response(request)
+        finally:
+            _use_primary.reset(token)
+        if unsafe:
+            sticky = settings.REPLICA_STICKY_SECONDS
+            response.set_cookie(settings.REPLICA_PIN_COOKIE, str(int(time.time()) + sticky), max_age=sticky,
+                                httponly=True, samesite='Lax')
+        return response
+
+    def is_pinned(self, request):
+        try:
+            return int(request.COOKIES.get(settings.REPLICA_PIN_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
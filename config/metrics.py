@@ -0,0 +1,180 @@
+import bisect
+import contextvars
+import math
+import threading
+import time
+from contextlib import ExitStack
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import Http404, HttpResponse
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+UNRESOLVED = '<unresolved>'
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+def percentile(values, fraction):
+    """ Nearest-rank percentile of a non-empty list, the benchmarks report latencies with it. """
+    values = sorted(values)
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+class Histogram:
+    """ Cumulative prometheus histogram: bucket counters, sum and count. """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {self.sum}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+class ViewMetrics:
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.sql_seconds = 0.0
+        self.responses = {}  # status code -> count
+        self.cache = {}  # (cache name, 'hit' or 'miss') -> count
+
+
+class Registry:
+    """ In-process metrics per resolved url name. Every worker process exposes its own numbers. """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view, status, duration, request_metrics):
+        with self._lock:
+            metrics = self._views.get(view)
+            if metrics is None:
+                metrics = self._views[view] = ViewMetrics()
+            metrics.latency.observe(duration)
+            metrics.queries.observe(request_metrics.queries)
+            metrics.sql_seconds += request_metrics.sql_seconds
+            metrics.responses[status] = metrics.responses.get(status, 0) + 1
+            for key, count in request_metrics.cache.items():
+                metrics.cache[key] = metrics.cache.get(key, 0) + count
+
+    def clear(self):
+        with self._lock:
+            self._views = {}
+
+    def render(self):
+        """ Prometheus text exposition format. """
+        lines = [
+            '# HELP django_http_request_duration_seconds Request latency by url name.',
+            '# TYPE django_http_request_duration_seconds histogram',
+        ]
+        with self._lock:
+            views = sorted(self._views.items())
+            for view, metrics in views:
+                lines += metrics.latency.lines('django_http_request_duration_seconds', f'view="{view}"')
+            lines += ['# HELP django_http_request_queries SQL queries per request by url name.',
+                      '# TYPE django_http_request_queries histogram']
+            for view, metrics in views:
+                lines += metrics.queries.lines('django_http_request_queries', f'view="{view}"')
+            lines += ['# HELP django_http_request_sql_seconds_total Time spent in SQL by url name.',
+                      '# TYPE django_http_request_sql_seconds_total counter']
+            lines += [f'django_http_request_sql_seconds_total{{view="{view}"}} {metrics.sql_seconds}'
+                      for view, metrics in views]
+            lines += ['# HELP django_http_responses_total Responses by url name and status code.',
+                      '# TYPE django_http_responses_total counter']
+            lines += [f'django_http_responses_total{{view="{view}",status="{status}"}} {count}'
+                      for view, metrics in views for status, count in sorted(metrics.responses.items())]
+            lines += ['# HELP django_cache_requests_total Application cache lookups by url name.',
+                      '# TYPE django_cache_requests_total counter']
+            lines += [f'django_cache_requests_total{{view="{view}",cache="{cache}",result="{result}"}} {count}'
+                      for view, metrics in views for (cache, result), count in sorted(metrics.cache.items())]
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class RequestMetrics:
+    """ Numbers of the current request, collected by the db execute wrapper and record_cache(). """
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.cache = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_seconds += time.perf_counter() - started
+
+
+def record_cache(name, hit):
+    """ Count a cache lookup for the current request. Does nothing outside of MetricsMiddleware. """
+    request_metrics = _current.get()
+    if request_metrics is not None:
+        key = (name, 'hit' if hit else 'miss')
+        request_metrics.cache[key] = request_metrics.cache.get(key, 0) + 1
+
+
+class MetricsMiddleware:
+    """
+    Record latency, SQL queries, SQL time and cache hits per resolved url name.
+    Removed from the middleware chain at startup unless settings.METRICS_ENABLED.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_metrics = RequestMetrics()
+        token = _current.set(request_metrics)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(request_metrics))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        match = request.resolver_match
+        view = match.view_name if match is not None else UNRESOLVED
+        if view != 'metrics':
+            registry.record(view, response.status_code, time.perf_counter() - started, request_metrics)
+        return response
+
+
+def metrics_view(request):
+    """ Prometheus scrape endpoint. Requires 'Authorization: Bearer <METRICS_TOKEN>' if the token is set. """
+    if not getattr(settings, 'METRICS_ENABLED', False):
+        raise Http404
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token and request.META.get('HTTP_AUTHORIZATION') != f'Bearer {token}':
+        return HttpResponse(status=401)
+    body = registry.render()
+    if apps.is_installed('jobs'):
+        from jobs.metrics import render as render_job_metrics
+        body += render_job_metrics()
+    return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,132 @@
+import logging
+import os
+import random
+import re
+import sys
+import traceback
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'MODE': 'off',  # 'off', 'log' (sampled requests) or 'strict' (raise)
+    'THRESHOLD': 5,  # same query shape from the same line this many times per request
+    'SAMPLE_RATE': 0.01,  # share of requests checked in 'log' mode
+}
+
+_IN_LIST_RE = re.compile(r'IN \((?:%s, )*%s\)')
+_PROJECT_DIR = str(settings.BASE_DIR)
+_THIS_FILE = os.path.abspath(__file__)
+
+
+class NPlusOneError(Exception):
+    pass
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'NPLUSONE', {})}
+
+
+def fingerprint(sql):
+    """ Query shape: Django sql has '%s' placeholders already, only IN lists of any length are collapsed. """
+    return _IN_LIST_RE.sub('IN (...)', sql)
+
+
+def call_site():
+    """ 'file:line in function' of the innermost project frame (not Django, not a library). """
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_PROJECT_DIR) and 'site-packages' not in filename and filename != _THIS_FILE:
+            return f'{os.path.relpath(filename, _PROJECT_DIR)}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return '<unknown>'
+
+
+def _project_stack():
+    """ Stack summary of project frames only, the library frames between them are noise. """
+    stack = traceback.extract_stack()
+    return ''.join(traceback.format_list(
+        [frame for frame in stack if frame.filename.startswith(_PROJECT_DIR)
+         and 'site-packages' not in frame.filename and frame.filename != _THIS_FILE]
+    ))
+
+
+class Detector:
+    """ db execute wrapper counting (query shape, call site) pairs. """
+
+    def __init__(self, threshold, strict=False, label=''):
+        self.threshold = threshold
+        self.strict = strict
+        self.label = label
+        self.counts = {}
+        self.detections = []
+
+    def __call__(self, execute, sql, params, many, context):
+        key = (fingerprint(sql), call_site())
+        count = self.counts[key] = self.counts.get(key, 0) + 1
+        if count == self.threshold:
+            message = (f'N+1 queries{self.label}: {self.threshold} x "{key[0]}" from {key[1]}\n'
+                       f'{_project_stack()}')
+            self.detections.append(message)
+            if self.strict:
+                raise NPlusOneError(message)
+        return execute(sql, params, many, context)
+
+    def report(self):
+        for message in self.detections:
+            logger.warning(message)
+
+
+@contextmanager
+def detect_n_plus_one(threshold=None, strict=True, label=''):
+    """ Check a block of code, e.g. a management command or a test: with detect_n_plus_one(): ... """
+    detector = Detector(threshold or get_config()['THRESHOLD'], strict=strict, label=label)
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(detector))
+        yield detector
+    if not strict:
+        detector.report()
+
+
+class NPlusOneMiddleware:
+    """
+    Flag the same query shape repeated from the same line within a request.
+    'log' mode checks a sample of requests and logs a warning with a stack summary,
+    'strict' mode checks every request and raises NPlusOneError. Not used when settings.NPLUSONE['MODE'] is 'off'.
+    """
+
+    def __init__(self, get_response):
+        config = get_config()
+        if config['MODE'] not in ('log', 'strict'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.strict = config['MODE'] == 'strict'
+        self.threshold = config['THRESHOLD']
+        self.sample_rate = 1 if self.strict else config['SAMPLE_RATE']
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+        with detect_n_plus_one(self.threshold, strict=self.strict, label=f' in {request.method} {request.path}'):
+            return self.get_response(request)
+
+
+class NPlusOneTestRunner(DiscoverRunner):
+    """ Test runner with the detector in strict mode, so tests of views fail on N+1 queries. """
+
+    def setup_test_environment(self, **kwargs):
+        super(NPlusOneTestRunner, self).setup_test_environment(**kwargs)
+        self._nplusone_settings = override_settings(NPLUSONE={**get_config(), 'MODE': 'strict'})
+        self._nplusone_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._nplusone_settings.disable()
+        super(NPlusOneTestRunner, self).teardown_test_environment(**kwargs)
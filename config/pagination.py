@@ -0,0 +1,205 @@
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import Http404
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class CursorJSONEncoder(DjangoJSONEncoder):
+    """ DjangoJSONEncoder cuts datetimes to milliseconds, a keyset position must keep microseconds. """
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super(CursorJSONEncoder, self).default(o)
+
+
+def encode_cursor(position, reverse=False):
+    """ Pack a keyset position into an opaque url-safe string. """
+    data = json.dumps({'p': position, 'r': reverse}, separators=(',', ':'), cls=CursorJSONEncoder).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """ Return (position, reverse) or raise ValueError for a malformed cursor. """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        position, reverse = data['p'], data['r']
+    except (binascii.Error, UnicodeError, ValueError, TypeError, KeyError):
+        raise ValueError('Invalid cursor.')
+    if not isinstance(position, list) or not isinstance(reverse, bool):
+        raise ValueError('Invalid cursor.')
+    if not all(value is None or isinstance(value, (str, int, float)) for value in position):
+        raise ValueError('Invalid cursor.')
+    return position, reverse
+
+
+def _clean_position(model, ordering, position):
+    """
+    Convert position values to the python types of the ordering fields. A crafted cursor with values of a wrong
+    type or out of the column range raises ValueError here instead of an error in filter() or in the database.
+    """
+    values = []
+    for field, value in zip(ordering, position):
+        try:
+            model_field = model._meta.get_field(field.lstrip('-'))
+        except FieldDoesNotExist:  # an annotation
+            values.append(value)
+            continue
+        if value is not None:
+            try:
+                value = model_field.to_python(value)
+                model_field.run_validators(value)
+            except ValidationError:
+                raise ValueError('Invalid cursor.')
+        values.append(value)
+    return values
+
+
+def _invert(field):
+    return field[1:] if field.startswith('-') else f'-{field}'
+
+
+def _position(obj, ordering):
+    return [getattr(obj, field.lstrip('-')) for field in ordering]
+
+
+def _keyset_filter(ordering, position, reverse):
+    """
+    Rows strictly after position in ordering (or before it if reverse).
+    ('-popularity', 'id'), (5, 42) -> popularity < 5 OR (popularity = 5 AND id > 42)
+    """
+    condition = Q()
+    for index, field in enumerate(ordering):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') != reverse else 'gt'
+        step = Q(**{f'{name}__{lookup}': position[index]})
+        for previous_field, previous_value in zip(ordering[:index], position[:index]):
+            step &= Q(**{previous_field.lstrip('-'): previous_value})
+        condition |= step
+    return condition
+
+
+class KeysetPage:
+    """ Page-like object for templates. Knows its neighbours but nothing about a total count. """
+    is_keyset = True
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def paginate_keyset(queryset, ordering, cursor, page_size):
+    """
+    Return a KeysetPage of queryset ordered by ordering (the last field must be unique, e.g. 'id').
+    Runs a single LIMIT query without COUNT and OFFSET, so the cost does not depend on page depth.
+    """
+    position, reverse = decode_cursor(cursor) if cursor else (None, False)
+    if position is not None:
+        if len(position) != len(ordering):
+            raise ValueError('Invalid cursor.')
+        position = _clean_position(queryset.model, ordering, position)
+
+    queryset = queryset.order_by(*(_invert(field) for field in ordering) if reverse else ordering)
+    if position is not None:
+        queryset = queryset.filter(_keyset_filter(ordering, position, reverse))
+
+    rows = list(queryset[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if reverse:
+        rows.reverse()
+    if not rows:
+        return KeysetPage(rows)
+
+    has_next = position is not None if reverse else has_more
+    has_previous = has_more if reverse else position is not None
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor(_position(rows[-1], ordering)) if has_next else None,
+        previous_cursor=encode_cursor(_position(rows[0], ordering), reverse=True) if has_previous else None,
+    )
+
+
+class KeysetPaginationMixin:
+    """
+    ListView mixin: paginate by '?cursor=' instead of '?page=' when get_keyset_ordering() returns ordering.
+    Falls back to the regular paginator otherwise (e.g. for relevance ordered search results).
+    """
+    keyset_ordering = None
+    cursor_kwarg = 'cursor'
+
+    def get_keyset_ordering(self):
+        return self.keyset_ordering
+
+    def paginate_queryset(self, queryset, page_size):
+        ordering = self.get_keyset_ordering()
+        if not ordering:
+            return super(KeysetPaginationMixin, self).paginate_queryset(queryset, page_size)
+        try:
+            page = paginate_keyset(queryset, ordering, self.request.GET.get(self.cursor_kwarg), page_size)
+        except ValueError:
+            raise Http404('Invalid cursor.')
+        return None, page, page.object_list, page.has_other_pages()
+
+
+class KeysetCursorPagination(BasePagination):
+    """
+    DRF pagination with opaque next/previous cursors and no count query.
+    Uses view.get_keyset_ordering(); views without it are paginated by PageNumberPagination.
+    """
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.fallback = None
+        ordering = view.get_keyset_ordering() if hasattr(view, 'get_keyset_ordering') else None
+        if not ordering:
+            self.fallback = PageNumberPagination()
+            return self.fallback.paginate_queryset(queryset, request, view)
+        try:
+            self.page = paginate_keyset(queryset, ordering, request.query_params.get(self.cursor_query_param),
+                                        self.page_size)
+        except ValueError:
+            raise NotFound('Invalid cursor.')
+        return self.page.object_list
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        if self.fallback is not None:
+            return self.fallback.get_paginated_response(data)
+        return Response({
+            'next': self.get_link(self.page.next_cursor),
+            'previous': self.get_link(self.page.previous_cursor),
+            'results': data,
+        })
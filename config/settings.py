@@ -43,6 +43,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'crispy_forms',
     'debug_toolbar',
     'storages',
@@ -53,6 +54,8 @@ INSTALLED_APPS = [
     'users',
     'authors',
     'api',
+    'authentication',
+    'jobs',
 ]
 
 REST_FRAMEWORK = {
@@ -62,7 +65,7 @@ REST_FRAMEWORK = {
             # 'rest_framework_simplejwt.authentication.JWTAuthentication',
             'authentication.backends.JWTAuthentication',
     ),
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'config.pagination.KeysetCursorPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend'
@@ -70,6 +73,9 @@ REST_FRAMEWORK = {
 }
 
 MIDDLEWARE = [
+    'config.metrics.MetricsMiddleware',
+    'config.nplusone.NPlusOneMiddleware',
+    'config.db_router.ReplicaPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -124,6 +130,23 @@ DATABASES = {
     }
 }
 
+# Read replicas: DB_REPLICA_HOSTS=host1,host2:5433 (same database and credentials as the primary)
+for number, address in enumerate(filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')), start=1):
+    host, _, port = address.strip().partition(':')
+    DATABASES[f'replica_{number}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'OPTIONS': {'connect_timeout': 2},
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['config.db_router.ReplicaRouter']
+REPLICA_STICKY_SECONDS = 10  # reads of a client go to the primary this long after its write
+REPLICA_HEALTH_CHECK_INTERVAL = 5
+REPLICA_MAX_LAG = 30  # seconds, None to ignore replication lag
+REPLICA_PIN_COOKIE = 'pin_primary'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -167,6 +190,9 @@ STATIC_URL = '/static/'
 
 AUTH_USER_MODEL = 'users.User'
 
+AUTHENTICATION_BACKENDS = ['users.backends.MembershipBackend']
+MEMBERSHIP_CACHE_TIMEOUT = 60 * 60
+
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
 
@@ -193,6 +219,81 @@ AWS_S3_REGION_NAME = os.getenv('AWS_S3_REGION_NAME')
 AWS_QUERYSTRING_AUTH = False
 AWS_S3_FILE_OVERWRITE = False
 
+# Profile pictures: uploads are validated, then re-encoded to WebP and JPEG squares of these sizes (pixels).
+# 'inline' processes a new picture right after it is saved, 'deferred' queues a job for run_jobs workers.
+PROFILE_IMAGE_SIZES = {'small': 64, 'medium': 160, 'large': 320}
+PROFILE_IMAGE_PROCESSING = os.getenv('PROFILE_IMAGE_PROCESSING', 'inline')
+PROFILE_IMAGE_MAX_BYTES = 5 * 1024 * 1024
+PROFILE_IMAGE_MIN_DIMENSION = 64
+PROFILE_IMAGE_MAX_DIMENSION = 6000
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+REVIEW_THREAD_CACHE_TIMEOUT = 60 * 60 * 24
+# Reviews per page of the book page, first comments shown per review, comments per "More comments"
+REVIEWS_PAGE_SIZE = 20
+COMMENTS_PREVIEW_SIZE = 5
+COMMENTS_PAGE_SIZE = 20
+# Books with more reviews are deleted by a background job (see books.tasks.delete_book)
+BOOK_DELETE_INLINE_MAX_REVIEWS = 100
+
+# Verified JWT tokens cache (see authentication.cache.TokenCache)
+JWT_CACHE = {
+    'LOCAL_MAXSIZE': 10000,
+    'LOCAL_TTL': 30,
+    'SHARED_TTL': 60 * 5,
+}
+
+# Max ids or isbn13 values per request of the api batch endpoints
+API_BATCH_LIMIT = 500
+
+# Background jobs (see jobs.queue), run by the run_jobs command. Times are in seconds.
+JOBS = {
+    'POLL_INTERVAL': 1,
+    'MAX_ATTEMPTS': 5,
+    'TIMEOUT': 5 * 60,
+    'LOCK_GRACE': 60,  # a running job is taken from its worker after TIMEOUT + LOCK_GRACE
+    'BACKOFF_BASE': 10,
+    'BACKOFF_MAX': 60 * 60,
+    'KEEP_DONE': 60 * 60 * 24,
+    'HOUSEKEEPING_INTERVAL': 60,
+}
+
+# Book popularity (see books.popularity): activity weights decay by half every HALF_LIFE_DAYS.
+# The recompute_popularity command (or the books.recompute_popularity job) rebuilds scores from WINDOW_DAYS.
+POPULARITY = {
+    'HALF_LIFE_DAYS': 7,
+    'EPOCH': '2021-01-01',  # scores are stored relative to it, must not be changed without a recompute
+    'WEIGHTS': {'review': 5, 'comment': 2, 'view': 0.1},  # must be > 0
+    'VIEW_FLUSH_INTERVAL': 30,  # seconds a process buffers page views
+    'WINDOW_DAYS': 90,
+}
+
+# Per url name latency, SQL and cache metrics on /metrics (see config.metrics)
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'false').lower() == 'true'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+# /api/async/ read endpoints (see api.async_views), off by default: with the sync ORM of Django 3.2 they were
+# slower than the sync views under ASGI in benchmark_asgi (about 50-60 req/s against 85-110 on one CPU).
+API_ASYNC_VIEWS = os.getenv('API_ASYNC_VIEWS', 'false').lower() == 'true'
+
+# N+1 queries detector (see config.nplusone). The test runner switches it to 'strict'.
+NPLUSONE = {
+    'MODE': os.getenv('NPLUSONE_MODE', 'off'),
+    'THRESHOLD': 5,
+    'SAMPLE_RATE': 0.01,
+}
+TEST_RUNNER = 'config.nplusone.NPlusOneTestRunner'
+
+# Full-text search settings
+BOOK_SEARCH_CONFIG = 'english'
+BOOK_SEARCH_POPULARITY_WEIGHT = 0.05  # score = rank * (1 + weight * popularity_rank)
+AUTHOR_SEARCH_MAX_RESULTS = 100
+
 ALLOWED_HOSTS = ['18.217.199.29', '*']
 
 
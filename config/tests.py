@@ -0,0 +1,74 @@
+import base64
+import datetime
+
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from authors.models import Author
+from books.models import Book
+from config.pagination import decode_cursor, encode_cursor, paginate_keyset
+
+
+def raw_cursor(text):
+    return base64.urlsafe_b64encode(text.encode('utf-8')).decode('ascii')
+
+
+class CursorTest(SimpleTestCase):
+    """ Cursors are opaque strings of a keyset position, anything else in '?cursor=' is a ValueError. """
+
+    def test_round_trip(self):
+        moment = datetime.datetime(2021, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc)
+        position, reverse = decode_cursor(encode_cursor([1.5, 'Tolstoy', moment, None, 42], reverse=True))
+        self.assertEqual(position, [1.5, 'Tolstoy', moment.isoformat(), None, 42])
+        self.assertTrue(reverse)
+
+    def test_invalid(self):
+        for cursor in ['', 'not base64!', raw_cursor('not json'), raw_cursor('[1, 2]'), raw_cursor('{"p": [1]}'),
+                       raw_cursor('{"p": 1, "r": false}'), raw_cursor('{"p": [1], "r": "yes"}'),
+                       raw_cursor('{"p": [{"id": 1}], "r": false}'), raw_cursor('{"p": [[1]], "r": false}'),
+                       'кириллица']:
+            with self.subTest(cursor=cursor), self.assertRaises(ValueError):
+                decode_cursor(cursor)
+
+
+class PaginateKeysetTest(TestCase):
+    """ Pages of paginate_keyset follow each other without gaps and duplicates in both directions. """
+
+    @classmethod
+    def setUpTestData(cls):
+        for number in range(7):
+            Author.objects.create(first_name='Ann', last_name=f'Writer{number % 3}')
+
+    def pages(self, ordering, cursor=None, reverse=False):
+        names = []
+        while True:
+            page = paginate_keyset(Author.objects.all(), ordering, cursor, 3)
+            names.append([author.id for author in page])
+            cursor = page.previous_cursor if reverse else page.next_cursor
+            if cursor is None:
+                return names
+
+    def test_forward_and_back(self):
+        ordering = ('last_name', 'id')
+        forward = self.pages(ordering)
+        expected = list(Author.objects.order_by(*ordering).values_list('id', flat=True))
+        self.assertEqual(sum(forward, []), expected)
+        last = paginate_keyset(Author.objects.all(), ordering, None, 6)
+        backward = self.pages(ordering, last.next_cursor, reverse=True)
+        self.assertEqual(sum(reversed(backward), []), expected)
+
+    def test_wrong_position(self):
+        for position in (['Writer1'], [1, 'Writer1'], ['Writer1', 'seven'], ['Writer1', 2 ** 63],
+                         ['x' * 101, 1]):
+            with self.subTest(position=position), self.assertRaises(ValueError):
+                paginate_keyset(Author.objects.all(), ('last_name', 'id'), encode_cursor(position), 3)
+
+    def test_datetime_position(self):
+        """ A position keeps microseconds of a datetime, the page after it starts right after the row. """
+        books = [Book.objects.create(title=f'Book {number}') for number in range(2)]
+        moment = timezone.now().replace(microsecond=123456)
+        Book.objects.update(updated_at=moment)
+        first = paginate_keyset(Book.objects.all(), ('updated_at', 'id'), None, 1)
+        self.assertTrue(decode_cursor(first.next_cursor)[0][0].endswith('.123456+00:00'))
+        second = paginate_keyset(Book.objects.all(), ('updated_at', 'id'), first.next_cursor, 1)
+        self.assertEqual([book.id for book in second], [books[1].id])
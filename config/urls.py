@@ -23,6 +23,7 @@ from django.views.generic.base import RedirectView
 from django.conf import settings
 from django.conf.urls.static import static
 
+from config.metrics import metrics_view
 from users import views as user_views
 
 urlpatterns = [
@@ -37,6 +38,7 @@ urlpatterns = [
     path('api/', include(('authentication.urls', 'authentication'))),
     path('api/', include(('api.urls', 'api'))),
     path('__debug__/', include(debug_toolbar.urls)),
+    path('metrics', metrics_view, name='metrics'),
 
 ]
 
@@ -0,0 +1,23 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Job, JobStats
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'priority', 'attempts', 'run_at', 'finished_at', 'worker')
+    list_filter = ('status', 'name')
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'locked_until', 'worker', 'last_error')
+    actions = ['retry']
+
+    @admin.action(description='Queue selected jobs again')
+    def retry(self, request, queryset):
+        queryset.exclude(status=Job.RUNNING).update(status=Job.QUEUED, attempts=0, run_at=timezone.now())
+
+
+class JobStatsAdmin(admin.ModelAdmin):
+    list_display = ('name', 'succeeded', 'retried', 'failed', 'run_seconds', 'wait_seconds')
+
+
+admin.site.register(Job, JobAdmin)
+admin.site.register(JobStats, JobStatsAdmin)
@@ -0,0 +1,58 @@
+import multiprocessing
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobs.worker import Worker
+
+
+def run_worker(burst):
+    worker = Worker()
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.work(burst=burst)
+
+
+class Command(BaseCommand):
+    help = 'Run background jobs (see jobs.queue) in worker processes until SIGTERM/SIGINT.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=multiprocessing.cpu_count())
+        parser.add_argument('--burst', action='store_true', help='Exit when there are no due jobs.')
+
+    def handle(self, *args, **options):
+        if options['processes'] == 1:
+            run_worker(options['burst'])
+            return
+
+        # Forked processes must not share the connections of the parent.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        stopping = False
+
+        def start():
+            process = context.Process(target=run_worker, args=(options['burst'],), daemon=True)
+            process.start()
+            return process
+
+        def stop(*args):
+            nonlocal stopping
+            stopping = True
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()  # SIGTERM: the worker finishes its current job
+
+        processes = [start() for _ in range(options['processes'])]
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        while processes:
+            time.sleep(1)
+            for process in list(processes):
+                if process.is_alive():
+                    continue
+                processes.remove(process)
+                if not stopping and not options['burst'] and process.exitcode != 0:
+                    self.stderr.write(f'Worker {process.pid} exited with {process.exitcode}, starting a new one.')
+                    processes.append(start())
@@ -0,0 +1,23 @@
+from django.db.models import Count
+
+from .models import Job, JobStats
+
+
+def render():
+    """ Prometheus lines of the job queue: queue depth and cumulative per task counters of all workers. """
+    lines = ['# HELP jobs_current Jobs in the table by task and status.', '# TYPE jobs_current gauge']
+    current = Job.objects.exclude(status=Job.DONE).order_by().values_list('name', 'status').annotate(total=Count('*'))
+    lines += [f'jobs_current{{task="{name}",status="{status}"}} {total}' for name, status, total in sorted(current)]
+
+    stats = list(JobStats.objects.order_by('name'))
+    lines += ['# HELP jobs_runs_total Finished job runs by task and result.', '# TYPE jobs_runs_total counter']
+    for row in stats:
+        for result in ('succeeded', 'retried', 'failed'):
+            lines.append(f'jobs_runs_total{{task="{row.name}",result="{result}"}} {getattr(row, result)}')
+    lines += ['# HELP jobs_run_seconds_total Time spent running jobs by task.',
+              '# TYPE jobs_run_seconds_total counter']
+    lines += [f'jobs_run_seconds_total{{task="{row.name}"}} {row.run_seconds}' for row in stats]
+    lines += ['# HELP jobs_wait_seconds_total Time jobs waited in the queue after they were due, by task.',
+              '# TYPE jobs_wait_seconds_total counter']
+    lines += [f'jobs_wait_seconds_total{{task="{row.name}"}} {row.wait_seconds}' for row in stats]
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,53 @@
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """ A queued call of a registered task (see jobs.queue), picked by run_jobs workers with SKIP LOCKED. """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    name = models.CharField(max_length=100)
+    kwargs = models.JSONField(default=dict, blank=True)
+    priority = models.SmallIntegerField(default=0, help_text='Higher runs first.')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # A running job whose worker died is queued again after this moment.
+    locked_until = models.DateTimeField(null=True, blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-priority', 'run_at'], condition=Q(status='queued'), name='job_queued_idx'),
+            models.Index(fields=['locked_until'], condition=Q(status='running'), name='job_running_idx'),
+            models.Index(fields=['finished_at'], condition=Q(status='done'), name='job_done_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.id} ({self.status})'
+
+
+class JobStats(models.Model):
+    """ Cumulative per task counters for /metrics, shared by all worker processes. """
+    name = models.CharField(max_length=100, primary_key=True)
+    succeeded = models.PositiveBigIntegerField(default=0)
+    retried = models.PositiveBigIntegerField(default=0)
+    failed = models.PositiveBigIntegerField(default=0)
+    run_seconds = models.FloatField(default=0)
+    wait_seconds = models.FloatField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'job stats'
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,65 @@
+import datetime
+
+from django.conf import settings
+
+HIGH = 10
+NORMAL = 0
+LOW = -10
+
+TASKS = {}
+
+
+class Task:
+    def __init__(self, func, name, priority, max_attempts, timeout):
+        self.func = func
+        self.name = name
+        self.priority = priority
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+
+    def __call__(self, **kwargs):
+        return self.func(**kwargs)
+
+    def enqueue(self, priority=None, delay=None, **kwargs):
+        return enqueue(self.name, kwargs, priority=priority, delay=delay)
+
+
+def task(name=None, priority=NORMAL, max_attempts=None, timeout=None):
+    """
+    Register a function of a tasks.py module as a task: @task() def reindex_books(book_ids): ...
+    Its name is '<app>.<function>' by default. Arguments must be keyword arguments which fit in JSON.
+    A job runs at least once: one running past its timeout and LOCK_GRACE is queued again while the first run
+    may still go on, so tasks must be idempotent.
+    """
+    def decorator(func):
+        registered = Task(
+            func,
+            name or f'{func.__module__.split(".")[0]}.{func.__name__}',
+            priority,
+            max_attempts or settings.JOBS['MAX_ATTEMPTS'],
+            timeout or settings.JOBS['TIMEOUT'],
+        )
+        TASKS[registered.name] = registered
+        return registered
+    return decorator
+
+
+def enqueue(name, kwargs=None, priority=None, delay=None):
+    """
+    Queue a task call. The job row is written in the current transaction: workers see it only after the commit,
+    so a job never runs before (or without) the data it works on, and a rollback drops the job too.
+    delay - seconds or timedelta to wait before the job may run.
+    """
+    from .models import Job
+
+    registered = TASKS[name]
+    job = Job(
+        name=name,
+        kwargs=kwargs or {},
+        priority=registered.priority if priority is None else priority,
+        max_attempts=registered.max_attempts,
+    )
+    if delay:
+        job.run_at = job.run_at + (delay if isinstance(delay, datetime.timedelta) else datetime.timedelta(seconds=delay))
+    job.save()
+    return job
@@ -0,0 +1,132 @@
+import datetime
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from jobs.models import Job, JobStats
+from jobs.queue import enqueue, task
+from jobs.worker import Worker
+
+calls = []
+
+
+@task(name='jobs.test_record', max_attempts=2)
+def record(value):
+    calls.append(value)
+
+
+@task(name='jobs.test_fail', max_attempts=2)
+def fail():
+    raise RuntimeError('Failed on purpose.')
+
+
+class WorkerLeaseTest(TestCase):
+    """
+    The outcome of a run is saved only while the job is still leased by it.
+    work_once() closes the connection between jobs, so the tests call fetch() and run().
+    """
+
+    def setUp(self):
+        calls.clear()
+        self.worker = Worker(name='test')
+
+    def test_done(self):
+        record.enqueue(value=1)
+        job = self.worker.fetch()
+        self.worker.run(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, calls), (Job.DONE, [1]))
+
+    def test_reclaimed_job_not_finished(self):
+        record.enqueue(value=1)
+        job = self.worker.fetch()
+        # Housekeeping took the job from a worker it presumed lost.
+        Job.objects.filter(id=job.id).update(status=Job.QUEUED)
+        self.worker.run(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertFalse(JobStats.objects.filter(name='jobs.test_record', succeeded__gt=0).exists())
+
+
+class WorkerRetryTest(TestCase):
+    """ Failed jobs are retried with a growing jittered delay until max_attempts. """
+
+    def setUp(self):
+        self.worker = Worker(name='test')
+
+    def run_due(self):
+        Job.objects.filter(status=Job.QUEUED).update(run_at=timezone.now())
+        job = self.worker.fetch()
+        self.worker.run(job)
+        job.refresh_from_db()
+        return job
+
+    def test_retry_then_fail(self):
+        fail.enqueue()
+        job = self.run_due()
+        delay = (job.run_at - job.finished_at).total_seconds()
+        base = settings.JOBS['BACKOFF_BASE']
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertTrue(base * 0.5 <= delay <= base * 1.5)
+        self.assertIn('Failed on purpose.', job.last_error)
+        job = self.run_due()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        stats = JobStats.objects.get(name='jobs.test_fail')
+        self.assertEqual((stats.retried, stats.failed), (1, 1))
+
+    def test_not_due(self):
+        record.enqueue(delay=60, value=1)
+        self.assertIsNone(self.worker.fetch())
+
+    def test_priority(self):
+        low = record.enqueue(priority=0, value=1)
+        high = record.enqueue(priority=10, value=2)
+        self.assertEqual([self.worker.fetch().id, self.worker.fetch().id], [high.id, low.id])
+
+    def test_unknown_task_fails_at_once(self):
+        job = Job.objects.create(name='jobs.missing')
+        self.worker.run(self.worker.fetch())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 1))
+
+    def test_lost_worker(self):
+        record.enqueue(value=1)
+        job = self.worker.fetch()
+        Job.objects.filter(id=job.id).update(locked_until=timezone.now() - datetime.timedelta(seconds=1))
+        self.worker.housekeeping()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.last_error), (Job.QUEUED, 'The worker was lost.'))
+
+
+class WorkerClaimTest(TransactionTestCase):
+    """ A job locked by another worker's transaction is skipped, not waited for. """
+
+    def test_skip_locked(self):
+        first, second = enqueue('jobs.test_record', {'value': 1}), enqueue('jobs.test_record', {'value': 2})
+        locked, release = threading.Event(), threading.Event()
+
+        def other_worker():
+            try:
+                with transaction.atomic():
+                    Job.objects.select_for_update().filter(id=first.id).first()
+                    locked.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=other_worker)
+        thread.start()
+        try:
+            self.assertTrue(locked.wait(10))
+            with connection.cursor() as cursor:
+                cursor.execute("SET lock_timeout = '2s'")  # fail instead of hanging if the lock is waited for
+            job = Worker(name='test').fetch()
+            self.assertEqual(job.id, second.id)
+        finally:
+            release.set()
+            thread.join()
+            with connection.cursor() as cursor:
+                cursor.execute('RESET lock_timeout')
@@ -0,0 +1,175 @@
+import datetime
+import logging
+import os
+import random
+import signal
+import socket
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job, JobStats
+from .queue import TASKS
+
+logger = logging.getLogger(__name__)
+
+
+class JobTimeout(Exception):
+    pass
+
+
+@contextmanager
+def time_limit(seconds):
+    """ Raise JobTimeout in the job after seconds. Works in the main thread of a worker process only. """
+    if threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def expired(signum, frame):
+        raise JobTimeout(f'The job did not finish in {seconds} seconds.')
+
+    previous = signal.signal(signal.SIGALRM, expired)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def backoff(attempts):
+    """ Exponential delay before the next attempt with +-50% jitter, so failed jobs do not retry in lockstep. """
+    delay = min(settings.JOBS['BACKOFF_MAX'], settings.JOBS['BACKOFF_BASE'] * 2 ** (attempts - 1))
+    return datetime.timedelta(seconds=delay * random.uniform(0.5, 1.5))
+
+
+def record_stats(name, **increments):
+    values = {field: F(field) + value for field, value in increments.items()}
+    if not JobStats.objects.filter(name=name).update(**values):
+        JobStats.objects.get_or_create(name=name)
+        JobStats.objects.filter(name=name).update(**values)
+
+
+class Worker:
+    def __init__(self, name=None):
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = False
+        self.last_housekeeping = 0
+
+    def stop(self, *args):
+        """ Finish the current job and exit. """
+        self.stopping = True
+
+    def fetch(self):
+        """ Lock the next due job. Concurrent workers skip locked rows instead of waiting for them. """
+        with transaction.atomic():
+            job = Job.objects.select_for_update(skip_locked=True)\
+                .filter(status=Job.QUEUED, run_at__lte=timezone.now())\
+                .order_by('-priority', 'run_at').first()
+            if job is None:
+                return None
+            registered = TASKS.get(job.name)
+            timeout = registered.timeout if registered else settings.JOBS['TIMEOUT']
+            job.status = Job.RUNNING
+            job.attempts += 1
+            job.started_at = timezone.now()
+            job.locked_until = job.started_at + datetime.timedelta(seconds=timeout + settings.JOBS['LOCK_GRACE'])
+            job.worker = self.name
+            job.save(update_fields=['status', 'attempts', 'started_at', 'locked_until', 'worker'])
+        return job
+
+    def run(self, job):
+        registered = TASKS.get(job.name)
+        wait = (job.started_at - job.run_at).total_seconds()
+        started = time.perf_counter()
+        try:
+            if registered is None:
+                raise LookupError(f'Unknown task {job.name!r}.')
+            with time_limit(registered.timeout):
+                registered(**job.kwargs)
+        except Exception:
+            self.failed(job, traceback.format_exc(), time.perf_counter() - started, wait, retry=registered is not None)
+        else:
+            duration = time.perf_counter() - started
+            job.status = Job.DONE
+            job.finished_at = timezone.now()
+            if self.finish(job, ['status', 'finished_at']):
+                record_stats(job.name, succeeded=1, run_seconds=duration, wait_seconds=wait)
+                logger.info('%s done in %.3fs (waited %.3fs)', job, duration, wait)
+
+    def finish(self, job, fields):
+        """
+        Save the outcome of a run if the job is still leased by it. A job which ran past locked_until may have been
+        queued again by housekeeping and belong to another attempt now, its outcome is not overwritten.
+        Returns False if the lease was lost.
+        """
+        updated = Job.objects.filter(id=job.id, status=Job.RUNNING, attempts=job.attempts)\
+            .update(**{field: getattr(job, field) for field in fields})
+        if not updated:
+            logger.warning('%s attempt %s finished after its lease expired, the outcome is dropped',
+                           job, job.attempts)
+        return bool(updated)
+
+    def failed(self, job, error, duration, wait, retry=True):
+        job.last_error = error
+        job.finished_at = timezone.now()
+        retry = retry and job.attempts < job.max_attempts
+        if retry:
+            job.status = Job.QUEUED
+            job.run_at = job.finished_at + backoff(job.attempts)
+        else:
+            job.status = Job.FAILED
+        if not self.finish(job, ['status', 'run_at', 'finished_at', 'last_error']):
+            return
+        if retry:
+            record_stats(job.name, retried=1, run_seconds=duration, wait_seconds=wait)
+            logger.warning('%s failed, attempt %s of %s, retry at %s', job, job.attempts, job.max_attempts, job.run_at)
+        else:
+            record_stats(job.name, failed=1, run_seconds=duration, wait_seconds=wait)
+            logger.error('%s failed after %s attempts:\n%s', job, job.attempts, error)
+
+    def housekeeping(self):
+        """ Queue again jobs of dead workers and delete old done jobs, at most every HOUSEKEEPING_INTERVAL. """
+        now = time.monotonic()
+        if now - self.last_housekeeping < settings.JOBS['HOUSEKEEPING_INTERVAL']:
+            return
+        self.last_housekeeping = now
+        lost = Job.objects.filter(status=Job.RUNNING, locked_until__lt=timezone.now())
+        # A job which takes its worker down every time (out of memory...) must not be retried forever.
+        lost.filter(attempts__gte=F('max_attempts')).update(
+            status=Job.FAILED, finished_at=timezone.now(), last_error='The worker was lost.')
+        reclaimed = lost.update(status=Job.QUEUED, run_at=timezone.now(), last_error='The worker was lost.')
+        if reclaimed:
+            logger.warning('Queued again %s jobs of lost workers', reclaimed)
+        keep_until = timezone.now() - datetime.timedelta(seconds=settings.JOBS['KEEP_DONE'])
+        old_ids = Job.objects.filter(status=Job.DONE, finished_at__lt=keep_until).values('id')[:10000]
+        Job.objects.filter(id__in=old_ids).delete()
+
+    def work_once(self):
+        """ Run one due job. Returns False if there was none. """
+        close_old_connections()
+        try:
+            self.housekeeping()
+            job = self.fetch()
+            if job is None:
+                return False
+            self.run(job)
+            return True
+        finally:
+            close_old_connections()
+
+    def work(self, burst=False):
+        """ Run jobs until stopped; with burst until the queue has no due jobs. """
+        logger.info('Worker %s started', self.name)
+        while not self.stopping:
+            if not self.work_once():
+                if burst:
+                    break
+                time.sleep(settings.JOBS['POLL_INTERVAL'])
+        logger.info('Worker %s stopped', self.name)
@@ -1,5 +1,9 @@
 from django.utils.http import urlencode
 from django import template
+from django.conf import settings
+
+from books.utils import can_manage_book
+from users.membership import has_group as user_has_group
 
 
 register = template.Library()
@@ -20,4 +24,24 @@ def query_param_replace(context, **kwargs):
 
 @register.filter(name='has_group')
 def has_group(user, group_name):
-    return user.groups.filter(name=group_name).exists()
+    return user_has_group(user, group_name)
+
+
+@register.filter(name='can_manage')
+def can_manage(user, book):
+    """ {% if request.user|can_manage:book %} - user is a staff or an author of the book. """
+    return can_manage_book(user, book)
+
+
+@register.inclusion_tag('users/avatar.html')
+def avatar(user, size='medium', css_class=''):
+    """ {% avatar user 'small' %} - the processed picture of the size, WebP with a JPEG fallback. """
+    side = settings.PROFILE_IMAGE_SIZES[size]
+    return {
+        'user': user,
+        'side': side,
+        'css_class': css_class,
+        'processed': bool(user.image_hash),
+        'webp_url': user.image_url(size, 'webp'),
+        'jpeg_url': user.image_url(size, 'jpeg'),
+    }
@@ -0,0 +1,14 @@
+from django.contrib.auth.backends import ModelBackend
+
+from .membership import get_membership
+
+
+class MembershipBackend(ModelBackend):
+    """ ModelBackend which reads permissions from the cached membership instead of two queries per request. """
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        if user_obj.is_superuser:
+            return super(MembershipBackend, self).get_all_permissions(user_obj, obj)
+        return set(get_membership(user_obj).permissions)
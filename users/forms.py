@@ -1,6 +1,7 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
 # from django.contrib.auth.models import User
+from .images import schedule_profile_image, validate_profile_image
 from .models import User
 
 
@@ -16,3 +17,19 @@ class UserUpdateForm(forms.ModelForm):
     class Meta:
         model = User
         fields = ['username', 'first_name', 'last_name', 'email', 'image']
+
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if image and 'image' in self.changed_data:
+            validate_profile_image(image)
+        return image
+
+    def save(self, commit=True):
+        image_changed = 'image' in self.changed_data
+        previous_hash = self.instance.image_hash
+        if image_changed:
+            self.instance.image_hash = ''
+        user = super(UserUpdateForm, self).save(commit)
+        if commit and image_changed:
+            schedule_profile_image(user.pk, previous_hash)
+        return user
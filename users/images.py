@@ -0,0 +1,155 @@
+import hashlib
+import io
+import logging
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.template.defaultfilters import filesizeformat
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILE_IMAGE = 'profile_pics/user_default.png'
+ALLOWED_FORMATS = ('JPEG', 'PNG', 'WEBP', 'GIF')
+# Pillow format and file extension of every stored size
+OUTPUT_FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+ORIGINAL_SIZE = 'original'
+
+
+def variant_name(image_hash, size, extension):
+    """ Content addressed name: a new picture gets new urls, so they can be cached forever. """
+    return f'profile_pics/{image_hash}/{size}.{extension}'
+
+
+def validate_profile_image(file):
+    """ Cheap checks before the upload is stored: byte size, format and dimensions (read from the header only). """
+    max_bytes = settings.PROFILE_IMAGE_MAX_BYTES
+    if file.size > max_bytes:
+        raise ValidationError(f'The image is larger than {filesizeformat(max_bytes)}.')
+    try:
+        position = file.tell()
+        with Image.open(file) as image:
+            image_format, (width, height) = image.format, image.size
+        file.seek(position)
+    except (UnidentifiedImageError, Image.DecompressionBombError):
+        raise ValidationError('Upload a valid image.')
+    if image_format not in ALLOWED_FORMATS:
+        raise ValidationError(f'Unsupported image format, use one of: {", ".join(ALLOWED_FORMATS)}.')
+    min_side, max_side = settings.PROFILE_IMAGE_MIN_DIMENSION, settings.PROFILE_IMAGE_MAX_DIMENSION
+    if min(width, height) < min_side or max(width, height) > max_side:
+        raise ValidationError(f'The image must be from {min_side} to {max_side} pixels on each side, '
+                              f'got {width}x{height}.')
+
+
+def _encode(image, pillow_format):
+    """ Re-encode without exif, icc or any other metadata of the upload. """
+    if pillow_format == 'JPEG' and image.mode != 'RGB':
+        # Flatten transparency on white, JPEG has no alpha channel.
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A') if 'A' in image.getbands() else None)
+        image = background
+    buffer = io.BytesIO()
+    if pillow_format == 'JPEG':
+        image.save(buffer, 'JPEG', quality=85, optimize=True, progressive=True)
+    else:
+        image.save(buffer, 'WEBP', quality=80, method=6)
+    return buffer.getvalue()
+
+
+def render_variants(data):
+    """
+    {(size, extension): bytes} for all PROFILE_IMAGE_SIZES (square, center cropped) and the cleaned original
+    which is limited to the largest size * 2 on the longest side.
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        image.seek(0)  # first frame of an animated gif
+        # Apply the camera rotation before the exif which holds it is dropped.
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P', 'PA') else 'RGB')
+
+    original = image.copy()
+    limit = max(settings.PROFILE_IMAGE_SIZES.values()) * 2
+    original.thumbnail((limit, limit), Image.LANCZOS)
+    renders = {ORIGINAL_SIZE: original}
+    for size, side in settings.PROFILE_IMAGE_SIZES.items():
+        renders[size] = ImageOps.fit(image, (side, side), Image.LANCZOS)
+
+    return {
+        (size, extension): _encode(render, pillow_format)
+        for size, render in renders.items()
+        for extension, pillow_format in OUTPUT_FORMATS.items()
+    }
+
+
+def delete_variants(image_hash):
+    """ Delete the stored copies of a picture unless a user still has it: the same picture is stored once. """
+    from .models import User
+
+    if not image_hash or User.objects.filter(image_hash=image_hash).exists():
+        return
+    for size in (ORIGINAL_SIZE, *settings.PROFILE_IMAGE_SIZES):
+        for extension in OUTPUT_FORMATS:
+            default_storage.delete(variant_name(image_hash, size, extension))
+
+
+def process_profile_image(user_id, previous_hash=''):
+    """
+    Replace the uploaded picture of a user with cleaned, resized WebP and JPEG copies named by the content hash.
+    Returns True if the picture was processed. The default picture and processed pictures are left alone.
+    previous_hash is the picture the upload replaced, its copies are deleted once they are not used.
+    """
+    from .models import User
+
+    user = User.objects.filter(pk=user_id).only('image', 'image_hash').first()
+    if user is None or not user.image or user.image.name == DEFAULT_PROFILE_IMAGE or user.image_hash:
+        delete_variants(previous_hash)
+        return False
+
+    uploaded_name = user.image.name
+    with default_storage.open(uploaded_name, 'rb') as file:
+        data = file.read()
+    image_hash = hashlib.sha256(data).hexdigest()[:16]
+
+    for (size, extension), content in render_variants(data).items():
+        name = variant_name(image_hash, size, extension)
+        # The same picture uploaded again (or by another user) is stored once.
+        if not default_storage.exists(name):
+            default_storage.save(name, ContentFile(content))
+
+    # Only if the user has not uploaded another picture meanwhile.
+    updated = User.objects.filter(pk=user_id, image=uploaded_name, image_hash='').update(
+        image=variant_name(image_hash, ORIGINAL_SIZE, 'jpeg'), image_hash=image_hash,
+    )
+    if updated:
+        # The upload still holds all the metadata (gps position etc.), it must not stay public.
+        default_storage.delete(uploaded_name)
+    else:
+        # Another picture was uploaded meanwhile, this one is not shown to anybody.
+        if not User.objects.filter(image=uploaded_name).exists():
+            default_storage.delete(uploaded_name)
+        delete_variants(image_hash)
+    delete_variants(previous_hash)
+    return bool(updated)
+
+
+def schedule_profile_image(user_id, previous_hash=''):
+    """
+    Process a new picture: after the transaction commits but still in the request in 'inline' mode,
+    by a run_jobs worker in 'deferred' mode. Until then the upload is served as is.
+    """
+    if settings.PROFILE_IMAGE_PROCESSING == 'deferred':
+        from .tasks import process_profile_image_task
+        process_profile_image_task.enqueue(user_id=user_id, previous_hash=previous_hash)
+        return
+
+    def process():
+        try:
+            process_profile_image(user_id, previous_hash)
+        except Exception:
+            # process_profile_images picks the picture up again, the user should not get an error for it.
+            logger.exception('Processing of the profile image of user %s failed', user_id)
+
+    transaction.on_commit(process)
@@ -0,0 +1,32 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from users.images import DEFAULT_PROFILE_IMAGE, process_profile_image
+from users.models import User
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = ('Resize and re-encode uploaded profile pictures which are not processed yet '
+            '(uploads from before the pipeline, or ones which failed).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, help='Process at most this many pictures.')
+
+    def handle(self, *args, **options):
+        pending = User.objects.filter(image_hash='').exclude(image='').exclude(image=DEFAULT_PROFILE_IMAGE)\
+            .order_by('id').values_list('id', flat=True)
+        if options['limit']:
+            pending = pending[:options['limit']]
+
+        processed, failed = 0, 0
+        for user_id in pending.iterator():
+            try:
+                processed += process_profile_image(user_id)
+            except Exception:
+                # A broken or missing upload must not stop the others.
+                logger.exception('Processing of the profile image of user %s failed', user_id)
+                failed += 1
+        self.stdout.write(f'Processed {processed} profile images, {failed} failed.')
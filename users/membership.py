@@ -0,0 +1,74 @@
+from django.conf import settings
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.db.models import Q
+
+from config.cache import bump_version, get_version
+from config.metrics import record_cache
+
+GLOBAL_VERSION_KEY = 'users:membership-version'
+
+
+class Membership:
+    """ Group names and 'app_label.codename' permissions of a user. """
+
+    def __init__(self, groups, permissions):
+        self.groups = groups
+        self.permissions = permissions
+
+
+def _version_key(user_id):
+    return f'{GLOBAL_VERSION_KEY}:{user_id}'
+
+
+def membership_version(user_id):
+    """
+    Changes with the groups and permissions of the user, cache keys of data which depends on them include it.
+    Read before the membership is loaded, so a change during the load is not cached under the new version.
+    """
+    return f'{get_version(GLOBAL_VERSION_KEY)}.{get_version(_version_key(user_id))}'
+
+
+def _cache_key(user_id):
+    return f'users:membership:{user_id}:{membership_version(user_id)}'
+
+
+def _load(user):
+    groups = frozenset(user.groups.values_list('name', flat=True))
+    permissions = frozenset(
+        f'{app_label}.{codename}' for app_label, codename in Permission.objects.filter(
+            Q(user=user) | Q(group__user=user)).values_list('content_type__app_label', 'codename').distinct()
+    )
+    return groups, permissions
+
+
+def get_membership(user):
+    """
+    Return Membership of the user. It is loaded once per user object (i.e. once per request)
+    from the shared cache or, on a miss, with two queries.
+    """
+    if not user.is_authenticated:
+        return Membership(frozenset(), frozenset())
+    if not hasattr(user, '_membership'):
+        key = _cache_key(user.pk)
+        data = cache.get(key)
+        record_cache('membership', data is not None)
+        if data is None:
+            data = _load(user)
+            cache.add(key, data, timeout=settings.MEMBERSHIP_CACHE_TIMEOUT)
+        user._membership = Membership(*data)
+    return user._membership
+
+
+def has_group(user, *group_names):
+    """ True if the user is a member of any of the groups. """
+    return not get_membership(user).groups.isdisjoint(group_names)
+
+
+def invalidate_user(user_id):
+    bump_version(_version_key(user_id))
+
+
+def invalidate_all():
+    """ Group permissions or names changed - drop memberships of everybody. """
+    bump_version(GLOBAL_VERSION_KEY)
@@ -2,12 +2,13 @@ import jwt
 
 from datetime import datetime, timedelta
 
-from PIL import Image
 from django.urls import reverse
 from django.db import models
 from django.contrib.auth.models import AbstractUser, BaseUserManager, PermissionsMixin
 from django.conf import settings
 
+from .images import DEFAULT_PROFILE_IMAGE, ORIGINAL_SIZE, variant_name
+
 
 class UserManager(BaseUserManager):
 
@@ -38,13 +39,22 @@ class UserManager(BaseUserManager):
 
 class User(AbstractUser):
     email = models.EmailField(verbose_name='email address', unique=True)
-    image = models.ImageField(default='profile_pics/user_default.png', upload_to='profile_pics')
+    image = models.ImageField(default=DEFAULT_PROFILE_IMAGE, upload_to='profile_pics')
+    # Content hash of the processed picture (see users.images), empty until the upload is processed
+    image_hash = models.CharField(max_length=16, blank=True, editable=False)
+    reviews_count = models.PositiveIntegerField(default=0, editable=False)
 
     objects = UserManager()
 
     def get_absolute_url(self):
         return reverse('users:profile-user', kwargs={'pk': self.id})
 
+    def image_url(self, size=ORIGINAL_SIZE, extension='jpeg'):
+        """ Url of a PROFILE_IMAGE_SIZES size of the picture; the picture itself until it is processed. """
+        if not self.image_hash:
+            return self.image.url
+        return self.image.storage.url(variant_name(self.image_hash, size, extension))
+
     @property
     def token(self):
         return self._generate_jwt_token()
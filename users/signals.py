@@ -0,0 +1,32 @@
+from django.contrib.auth.models import Group
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .membership import invalidate_all, invalidate_user
+from .models import User
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def user_membership_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        # group.user_set.clear() - pk_set is None, remember members before they are unlinked.
+        instance._cleared_user_ids = list(instance.user_set.values_list('id', flat=True))
+    elif action == 'post_clear':
+        user_ids = getattr(instance, '_cleared_user_ids', []) if reverse else [instance.pk]
+        for user_id in user_ids:
+            invalidate_user(user_id)
+    elif action in ('post_add', 'post_remove'):
+        for user_id in (pk_set if reverse else [instance.pk]):
+            invalidate_user(user_id)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def group_permissions_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_all()
+
+
+@receiver([post_save, post_delete], sender=Group)
+def group_changed(sender, **kwargs):
+    invalidate_all()
@@ -0,0 +1,9 @@
+from jobs.queue import HIGH, task
+
+from .images import process_profile_image
+
+
+@task(name='users.process_profile_image', priority=HIGH, timeout=60)
+def process_profile_image_task(user_id, previous_hash=''):
+    """ The user waits to see the new picture on the profile. """
+    process_profile_image(user_id, previous_hash)
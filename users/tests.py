@@ -1,3 +1,73 @@
-from django.test import TestCase
+import io
+import tempfile
 
-# Create your tests here.
+from PIL import Image
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+
+from users.images import ORIGINAL_SIZE, process_profile_image, variant_name
+from users.membership import get_membership, membership_version
+from users.models import User
+
+
+class MembershipCacheTest(TestCase):
+    """ Cached group membership is dropped when the groups of the user change. """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', email='reader@example.com', password='password')
+        cls.group = Group.objects.create(name='editors')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_group_added(self):
+        self.assertEqual(get_membership(User.objects.get(id=self.user.id)).groups, frozenset())
+        version = membership_version(self.user.id)
+        self.user.groups.add(self.group)
+        self.assertNotEqual(membership_version(self.user.id), version)
+        self.assertEqual(get_membership(User.objects.get(id=self.user.id)).groups, {'editors'})
+
+
+class ProfileImageCleanupTest(TestCase):
+    """ The copies of a replaced picture are deleted unless another user has the same picture. """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        storage = override_settings(DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage',
+                                    MEDIA_ROOT=directory.name)
+        storage.enable()
+        self.addCleanup(storage.disable)
+        self.user = User.objects.create_user(username='reader', email='reader@example.com', password='password')
+
+    def upload(self, user, color):
+        buffer = io.BytesIO()
+        Image.new('RGB', (100, 100), color).save(buffer, 'PNG')
+        previous_hash = user.image_hash
+        user.image.save('upload.png', ContentFile(buffer.getvalue()), save=False)
+        user.image_hash = ''
+        user.save(update_fields=['image', 'image_hash'])
+        uploaded_name = user.image.name
+        self.assertTrue(process_profile_image(user.pk, previous_hash))
+        user.refresh_from_db()
+        self.assertFalse(default_storage.exists(uploaded_name))
+        return user.image_hash
+
+    def test_previous_picture_deleted(self):
+        first = self.upload(self.user, 'red')
+        self.assertTrue(default_storage.exists(variant_name(first, ORIGINAL_SIZE, 'webp')))
+        second = self.upload(self.user, 'blue')
+        self.assertFalse(default_storage.exists(variant_name(first, ORIGINAL_SIZE, 'webp')))
+        self.assertFalse(default_storage.exists(variant_name(first, 'small', 'jpeg')))
+        self.assertTrue(default_storage.exists(variant_name(second, 'small', 'jpeg')))
+
+    def test_shared_picture_kept(self):
+        other = User.objects.create_user(username='writer', email='writer@example.com', password='password')
+        first = self.upload(self.user, 'red')
+        self.assertEqual(self.upload(other, 'red'), first)
+        self.upload(self.user, 'blue')
+        self.assertTrue(default_storage.exists(variant_name(first, 'small', 'jpeg')))
@@ -1,5 +1,7 @@
 from django.core.exceptions import PermissionDenied
 
+from .membership import has_group
+
 
 class GroupRequiredMixin(object):
     """
@@ -11,10 +13,6 @@ class GroupRequiredMixin(object):
     def dispatch(self, request, *args, **kwargs):
         if not request.user.is_authenticated:
             raise PermissionDenied
-        else:
-            user_groups = []
-            for group in request.user.groups.values_list('name', flat=True):
-                user_groups.append(group)
-            if len(set(user_groups).intersection(self.group_required)) <= 0:
-                raise PermissionDenied
+        elif not has_group(request.user, *self.group_required):
+            raise PermissionDenied
         return super(GroupRequiredMixin, self).dispatch(request, *args, **kwargs)
\ No newline at end of file